@@ -0,0 +1,236 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+import project
+
+
+# Genres of the synthetic catalog, most popular first
+GENRES = [
+    'Action', 'Comedy', 'Drama', 'Romance', 'Fantasy', 'Adventure', 'Slice of Life', 'Sci-Fi', 'Mystery', 'Supernatural',
+    'Suspense', 'Sports', 'Horror', 'Mecha', 'Music', 'Psychological', 'Historical', 'Isekai', 'School', 'Thriller'
+]
+
+# Episode counts drawn for each episode range, matching the ranges in EPISODE_RANGE_FLAGS
+EPISODE_COUNTS = {'Short': (1, 15), 'Medium': (16, 30), 'Long': (31, 100), 'Very Long': (101, 1000)}
+
+# Words the synthetic descriptions are made of
+WORDS = (
+    'young hero village academy ninja spy family pianist soldier letters dragon kingdom prince princess wizard magic sword school '
+    'club tournament volleyball basketball titan demon slayer alchemist brother sister detective notebook ghost spirit robot pilot '
+    'space station time travel future past war peace friendship rival team coach mystery murder island journey treasure pirate '
+    'guild quest power secret memory dream city tower castle forest ocean mountain shrine festival summer winter love betrayal revenge'
+).split()
+
+# Rows generated per chunk; a fixed chunk size keeps catalogs identical for a given seed however they are written
+GENERATOR_CHUNK_ROWS = 100_000
+
+
+# Function to generate one chunk of a seeded synthetic catalog
+def generate_catalog_chunk(start, rows, seed=0):
+    rng = np.random.default_rng([seed, start // GENERATOR_CHUNK_ROWS])
+
+    # One to four genres per title, with popular genres picked far more often
+    popularity = 1 / np.arange(1, len(GENRES) + 1)
+    popularity /= popularity.sum()
+    genre_counts = rng.choice([1, 2, 3, 4], size=rows, p=[0.25, 0.4, 0.25, 0.1])
+    genres = [', '.join(rng.choice(GENRES, size=count, replace=False, p=popularity)) for count in genre_counts]
+
+    ranges = rng.choice(list(EPISODE_COUNTS), size=rows, p=[0.15, 0.3, 0.35, 0.2])
+    episodes = [int(rng.integers(EPISODE_COUNTS[label][0], EPISODE_COUNTS[label][1] + 1)) for label in ranges]
+
+    # Descriptions of roughly the same length as the shipped catalog (about 900 characters), ending with the episode count
+    lengths = np.clip(rng.normal(150, 35, size=rows), 60, 300).astype(int)
+    word_ids = rng.integers(0, len(WORDS), size=lengths.sum())
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    titles = [f"Synthetic Anime {start + i + 1}" for i in range(rows)]
+    descriptions = [
+        f"{titles[i]} follows a {' '.join(WORDS[w] for w in word_ids[bounds[i]:bounds[i + 1]])}.\n\nIn total, there are {episodes[i]} episodes of {titles[i]}."
+        for i in range(rows)
+    ]
+    disclaimers = rng.choice([
+        'Contains mild violence.', 'Suitable for all ages.', 'Contains mature themes and some violence.',
+        'Contains romantic themes suitable for a young adult audience.'
+    ], size=rows)
+
+    return pd.DataFrame({
+        'title': titles,
+        'genre': genres,
+        'episode_range': ranges,
+        'description': descriptions,
+        'disclaimer': disclaimers
+    })
+
+
+# Function to generate a whole seeded synthetic catalog in memory
+def generate_catalog(rows, seed=0):
+    chunks = [generate_catalog_chunk(start, min(GENERATOR_CHUNK_ROWS, rows - start), seed) for start in range(0, rows, GENERATOR_CHUNK_ROWS)]
+    return pd.concat(chunks, ignore_index=True) if chunks else generate_catalog_chunk(0, 0, seed)
+
+
+# Function to write a synthetic catalog CSV chunk by chunk, so catalogs larger than memory can be generated
+def write_catalog(path, rows, seed=0):
+    for start in range(0, rows, GENERATOR_CHUNK_ROWS):
+        chunk = generate_catalog_chunk(start, min(GENERATOR_CHUNK_ROWS, rows - start), seed)
+        chunk.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False, encoding='ISO-8859-1')
+    return path
+
+
+# Function to time a callable, returning summary statistics in seconds; setup runs untimed before every call
+def measure(function, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return {'min_s': min(timings), 'median_s': statistics.median(timings), 'mean_s': statistics.fmean(timings), 'repeat': repeat}
+
+
+# Function to silence the program's rich output while still paying for formatting it
+@contextlib.contextmanager
+def quiet_output():
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+# Function to run every benchmark against a synthetic catalog of the given size
+def run_benchmarks(rows, seed=0, repeat=5, workdir=None):
+    results = []
+
+    # Every call starts from an empty result cache so the work itself is timed; cached benchmarks time the hits on purpose
+    def record(name, function, times=repeat, cached=False):
+        if cached:
+            function()
+        setup = None if cached else project.RESULT_CACHE.clear
+        results.append({'name': name, 'rows': rows, **measure(function, times, setup)})
+
+    with tempfile.TemporaryDirectory(dir=workdir) as directory:
+        path = write_catalog(os.path.join(directory, 'anime_data.csv'), rows, seed)
+
+        # Catalog load: parsing the CSV file, compiling it, opening the compiled form and building the index
+        record('load.read_csv', lambda: project.read_catalog_csv(path), times=min(repeat, 3))
+        record('load.compile', lambda: project.open_catalog(path, recompile=True), times=1)
+        record('load.open_compiled', lambda: project.open_catalog(path), times=min(repeat, 3))
+        df, text = project.open_catalog(path)
+        record('load.index', lambda: project.CatalogIndex(df, text), times=min(repeat, 3))
+        index = project.CatalogIndex(df, text)
+
+        # Pick a popular genre and one of its available episode ranges for the per-query benchmarks
+        genre = index.genres[int(np.argmax(index.facet_counts.sum(axis=1)))]
+        range_choice = int(np.flatnonzero(index.availability(genre))[0]) + 1
+        episode_range = index.episode_ranges[range_choice - 1]
+        recommendations = project.get_anime_recommendations(df, genre, episode_range, index)
+
+        with quiet_output(), patch('builtins.input', return_value='1'):
+            record('get_genre', lambda: project.get_genre(df, index))
+            record('anime_description', lambda: project.anime_description(df, recommendations, index))
+        with quiet_output(), patch('builtins.input', return_value=str(range_choice)):
+            record('get_episode_range', lambda: project.get_episode_range(df, genre, index))
+
+        record('get_anime_recommendations', lambda: project.get_anime_recommendations(df, genre, episode_range, index))
+        record('genre_query', lambda: project.get_genre_query_recommendations(df, index, f"{genre} AND NOT {index.genres[-1]}", ['Short', 'Long']))
+        record('anime_recommendation_table.page', lambda: project.recommendation_table_page(recommendations, 0))
+
+        # The same lookups answered from the result cache, as when a user asks again
+        with quiet_output(), patch('builtins.input', return_value='1'):
+            record('anime_description.cached', lambda: project.anime_description(df, recommendations, index), cached=True)
+        record('get_anime_recommendations.cached', lambda: project.get_anime_recommendations(df, genre, episode_range, index), cached=True)
+        record('anime_recommendation_table.page.cached', lambda: project.recommendation_table_page(recommendations, 0), cached=True)
+        if rows <= 100_000:
+            # Rendering every match is what the paginated renderer avoids; it is only timed while still affordable
+            record('anime_recommendation_table.full', lambda: project.anime_recommendation_table(recommendations), times=min(repeat, 3))
+
+        # Keyword search and description similarity, including the one-off cost of building their indexes
+        record('search.build', index.search_index, times=1)
+        record('search.query', lambda: index.search_index().search('ninja village*'))
+        if rows <= 100_000:
+            record('similarity.build', index.similarity_index, times=1)
+            record('similarity.query', lambda: index.similarity_index().similar(0, 10))
+
+    return results
+
+
+# Function to compare two benchmark result files, returning the rows of the comparison and whether any regressed
+def compare_results(baseline, current, threshold=0.1):
+    baseline_medians = {(result['name'], result['rows']): result['median_s'] for result in baseline['results']}
+    comparison = []
+    for result in current['results']:
+        key = (result['name'], result['rows'])
+        if key not in baseline_medians:
+            continue
+        ratio = result['median_s'] / baseline_medians[key] if baseline_medians[key] > 0 else float('inf')
+        comparison.append({
+            'name': result['name'],
+            'rows': result['rows'],
+            'baseline_s': baseline_medians[key],
+            'current_s': result['median_s'],
+            'ratio': ratio,
+            'regressed': ratio > 1 + threshold,
+        })
+    return comparison, any(row['regressed'] for row in comparison)
+
+
+# Function to read the command line options
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the Anime Recommendation System")
+    parser.add_argument("--rows", type=int, nargs='+', default=[1_000, 10_000, 100_000], help="catalog sizes to benchmark (up to 10,000,000)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic catalog generator")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--output", default="bench_results.json", help="file the results are written to as JSON")
+    parser.add_argument("--workdir", help="directory for the generated catalogs (defaults to the system temp directory)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two result files instead of running the benchmarks")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown of the median, as a fraction, reported as a regression")
+    return parser.parse_args(argv)
+
+
+# Main function to run or compare the benchmarks
+def main(argv=None):
+    args = parse_arguments(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as baseline_file, open(args.compare[1], encoding='utf-8') as current_file:
+            comparison, regressed = compare_results(json.load(baseline_file), json.load(current_file), args.threshold)
+        for row in comparison:
+            flag = 'REGRESSION' if row['regressed'] else 'ok'
+            print(f"{row['name']:<36} {row['rows']:>10,} {row['baseline_s'] * 1000:>12.3f} ms {row['current_s'] * 1000:>12.3f} ms {row['ratio']:>7.2f}x  {flag}")
+        return 1 if regressed else 0
+
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': [],
+    }
+    for rows in args.rows:
+        print(f"Benchmarking {rows:,} titles...", file=sys.stderr)
+        report['results'].extend(run_benchmarks(rows, args.seed, args.repeat, args.workdir))
+
+        # Write after every size so a long run still leaves usable results behind
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    for result in report['results']:
+        print(f"{result['name']:<36} {result['rows']:>10,} {result['median_s'] * 1000:>12.3f} ms")
+    return 0
+
+
+# Entry point for the benchmarks
+if __name__ == "__main__":
+    sys.exit(main())
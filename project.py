@@ -1,41 +1,431 @@
+import argparse
+import atexit
+import builtins
+import collections
+import collections.abc
+import codecs
+import contextlib
+import contextvars
+import csv
+import datetime
+import functools
+import hashlib
+import importlib
+import io
+import itertools
+import json
+import math
 import os
-import pandas as pd
-from rich import print
-from tabulate import tabulate
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; appends are still single writes, only rotation loses its cross-process lock
+    fcntl = None
+
+
+# Stand-in for a heavy module: imports it on first attribute access, then puts the real module in its place
+class LazyModule:
+    def __init__(self, name, alias):
+        self._name = name
+        self._alias = alias
+
+    def __getattr__(self, attribute):
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module
+        return getattr(module, attribute)
+
+
+# Heavy modules only load once something needs them, so the greeting and menus come up without them
+np = LazyModule('numpy', 'np')
+pd = LazyModule('pandas', 'pd')
+asyncio = LazyModule('asyncio', 'asyncio')
+futures = LazyModule('concurrent.futures', 'futures')
+multiprocessing = LazyModule('multiprocessing', 'multiprocessing')
+urllib_parse = LazyModule('urllib.parse', 'urllib_parse')
+
+
+# Input and output of the session running in the current thread; None means the terminal
+SESSION_IO = contextvars.ContextVar('session_io', default=None)
+
+
+# Function to print rich markup, loading rich on the first call. Output meant for another file, such as
+# warnings on stderr, always goes to the terminal.
+def print(*objects, **kwargs):
+    session_io = SESSION_IO.get()
+    if session_io is not None and kwargs.get('file') is None:
+        write = session_io.print
+    else:
+        from rich import print as write
+    if not PROFILER.enabled:
+        return write(*objects, **kwargs)
+    with PROFILER.stage('print'):
+        write(*objects, **kwargs)
+
+
+# Function to read a line from the user, timing the wait apart from the work around it. The step names the
+# question for scripted sessions
+def input(prompt='', step=None):
+    session_io = SESSION_IO.get()
+    read = functools.partial(session_io.input, step=step) if session_io is not None else builtins.input
+    if not PROFILER.enabled:
+        return read(prompt)
+    with PROFILER.stage('input'):
+        return read(prompt)
+
+
+# Available episode ranges and their descriptions, in menu order
+EPISODE_RANGE_FLAGS = {
+    "Short": "1 to 15 episodes",
+    "Medium": "16 to 30 episodes",
+    "Long": "31 to 100 episodes",
+    "Very Long": "101+ episodes"
+}
+
+# Episode counts each episode range preset stands for, in menu order; the last one has no upper bound
+EPISODE_RANGE_BOUNDS = {
+    "Short": (1, 15),
+    "Medium": (16, 30),
+    "Long": (31, 100),
+    "Very Long": (101, None)
+}
+
+# Column holding the total number of episodes of each title (-1 when unknown), extracted from its description
+EPISODE_COUNT_COLUMN = 'episode_count'
+
+# Episode counts written in descriptions: the number just before the word "episodes" ("24", "1,050"), and "is 37"
+# in sentences such as "the total number of episodes is 37"; counts stay far below 2**30
+EPISODE_COUNT_PATTERN = re.compile(r"(?<![\d,])(\d{1,3}(?:,\d{3}){1,2}|\d{1,6})\s+$")
+EPISODE_TOTAL_IS_PATTERN = re.compile(r"\bis\s+(\d{1,3}(?:,\d{3}){1,2}|\d{1,6})\b")
+
+# Episode counts typed as a range: "10-40", "10–40", "10 to 40", "100+" or a single number, optionally with "episodes"
+EPISODE_QUERY_PATTERN = re.compile(r"(\d{1,9})\s*(?:(?:-|–|—|to)\s*(\d{1,9})|(\+))?(?:\s*episodes?)?", re.IGNORECASE)
+
+# Columns every catalog must provide
+REQUIRED_COLUMNS = ['title', 'genre', 'episode_range', 'description', 'disclaimer']
+
+# Long text columns that stay on disk and are only decoded for the title the user picks
+TEXT_COLUMNS = ['description', 'disclaimer']
+
+# Columns with few distinct values, kept as small integer codes into their distinct values
+CATEGORICAL_COLUMNS = ['genre', 'episode_range']
+
+# Words that carry no meaning for comparing or searching descriptions
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    "a an and are as at be been but by for from has have he her his in into is it its of on or she so than that the their them "
+    "there they this to was were which while who with".split()
+)
+
+# Recommendations shown per page, and the bounds used to size the table columns without reading every title
+RECOMMENDATION_PAGE_SIZE = 20
+MAX_TITLE_WIDTH = 60
+WIDTH_SAMPLE_SIZE = 1000
+
+# Descriptions tokenized per chunk while building the similarity vectors, and the arrays the vectors are stored in
+SIMILARITY_CHUNK_ROWS = 10_000
+BIGRAM_FLAG = 1 << 62
+SIMILARITY_ARRAYS = ('row_ptr', 'row_features', 'row_weights', 'col_ptr', 'col_rows', 'col_weights')
+
+# Rows parsed per chunk while reading the catalog CSV file, and the largest field accepted, so memory stays bounded
+CATALOG_CHUNK_ROWS = 50_000
+CATALOG_FIELD_LIMIT = 16 * 1024 * 1024
+
+# Bad rows of the catalog CSV file kept with their line numbers, and how many of them are printed
+BAD_ROWS_KEPT = 100
+BAD_ROWS_PRINTED = 10
+
+# Version of the compiled catalog layout; bump it whenever the on-disk format changes
+CATALOG_FORMAT_VERSION = 5
+
+
+# Per-stage timers and counters; everything is a no-op until enabled, so normal sessions pay one flag check per call
+class Profiler:
+    def __init__(self, max_samples=10000):
+        self.enabled = False
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.samples = collections.defaultdict(lambda: collections.deque(maxlen=self.max_samples))
+            self.calls = collections.Counter()
+            self.totals = collections.Counter()
+            self.counters = collections.Counter()
+            self.stacks = collections.Counter()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    # Time a stage. Time spent waiting in input() is left out of the stages around it, and nested stages
+    # are remembered as ';'-joined stacks of their own time, the folded format flame graph tools read.
+    @contextlib.contextmanager
+    def stage(self, name):
+        local = self.local
+        if not hasattr(local, 'stack'):
+            local.stack, local.waited = [], 0.0
+        frame = [name, 0.0]
+        local.stack.append(frame)
+        waited = local.waited
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            path = ';'.join(entry[0] for entry in local.stack)
+            local.stack.pop()
+            if local.stack:
+                local.stack[-1][1] += elapsed
+            if name == 'input':
+                local.waited += elapsed
+            else:
+                elapsed -= local.waited - waited
+            with self.lock:
+                self.samples[name].append(elapsed)
+                self.calls[name] += 1
+                self.totals[name] += elapsed
+                self.stacks[path] += max(0.0, time.perf_counter() - started - frame[1])
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] += amount
+
+    # Copy of every stage's latencies in milliseconds and of every counter
+    def snapshot(self):
+        with self.lock:
+            samples = {name: list(values) for name, values in self.samples.items()}
+            calls, totals, counters = dict(self.calls), dict(self.totals), dict(self.counters)
+        stages = {}
+        for name in sorted(samples, key=totals.get, reverse=True):
+            p50, p90, p99 = np.percentile(samples[name], [50, 90, 99]) * 1000
+            stages[name] = {
+                'calls': calls[name], 'total_ms': round(totals[name] * 1000, 3), 'mean_ms': round(totals[name] * 1000 / calls[name], 3),
+                'p50_ms': round(p50, 3), 'p90_ms': round(p90, 3), 'p99_ms': round(p99, 3)
+            }
+        return {'stages': stages, 'counters': counters}
+
+    # Stage stacks with their own time in microseconds, one 'outer;inner count' line each
+    def folded(self):
+        with self.lock:
+            return ''.join(f"{path} {round(seconds * 1e6)}\n" for path, seconds in sorted(self.stacks.items()))
+
+
+# Profiler shared by the whole program
+PROFILER = Profiler()
+
+
+# Decorator to time every call of a function as a stage named after it
+def profiled(function):
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not PROFILER.enabled:
+            return function(*args, **kwargs)
+        with PROFILER.stage(name):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+# Thread-safe LRU cache of query results, bounded by entry count and by approximate bytes. Keys start with the
+# version of the catalog index they were computed from (0 for results keyed on their own content), and a newer
+# version drops every older one, so a reloaded catalog never serves stale results.
+class ResultCache:
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.bytes = 0
+        self.version = 0
+        self.hits = self.misses = self.evictions = 0
+
+    # Return the cached result for a key, computing and storing it on a miss
+    def get_or_compute(self, key, compute):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        size = value.nbytes if hasattr(value, 'nbytes') else sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key[0] > self.version:
+                self.version = key[0]
+                for stale in [stale for stale in self.entries if 0 < stale[0] < self.version]:
+                    self.bytes -= self.entries.pop(stale)[1]
+            elif 0 < key[0] < self.version:
+                return
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self.bytes -= self.entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    # Hit and miss counts and current size, for monitoring
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits, 'misses': self.misses, 'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions, 'entries': len(self.entries), 'bytes': self.bytes
+            }
+
+
+# Result cache shared by the whole program, and the source of catalog index versions
+RESULT_CACHE = ResultCache()
+CATALOG_VERSIONS = itertools.count(1)
+
+
+# Function to get a short digest of a list of titles, for caching output keyed on what it shows
+def titles_digest(titles):
+    digest = hashlib.blake2b(digest_size=16)
+    for title in titles:
+        digest.update(str(title).encode('utf-8', 'surrogatepass') + b'\0')
+    return digest.digest()
 
 
 # Main function to run the anime recommendation system
 def main():
-    try:
-        # Read the anime data from a CSV file
-        anime_df = pd.read_csv(r'anime_data.csv', encoding ='ISO-8859-1')
+    args = parse_arguments()
+    if args.profile or args.profile_trace or args.profile_folded:
+        start_profiling(args.profile_trace, args.profile_folded)
 
-        # Check for missing or essential columns after reading the file
-        required_columns = ['title', 'genre', 'episode_range', 'description', 'disclaimer']
-        missing_columns = [col for col in required_columns if col not in anime_df.columns]
-
-        if missing_columns:
-            print(f"[bold indian_red]Error: Missing required columns: {', '.join(missing_columns)}[/bold indian_red]")
+    # Interactive sessions show the menus from the compiled catalog's summary while the catalog itself loads,
+    # so neither pandas nor the catalog data is needed before the user's first answers
+    interactive = not (args.compile or args.serve or args.memory_report or any(option is not None for option in (args.search, args.genres, args.batch, args.replay)))
+    summary = read_catalog_summary(args.catalog) if interactive else None
+    if summary is not None:
+        pending_catalog = BackgroundTask(load_anime_catalog, args)
+        anime_df = anime_index = None
+    else:
+        catalog = load_anime_catalog(args)
+        if catalog is None:
             return
+        anime_df, anime_index = catalog
 
-    except FileNotFoundError:
-        print("[bold indian_red]Error: The specified file was not found.[/bold indian_red]")
+    # Follow edits to the catalog file, applying only the rows that changed; interactive sessions start
+    # watching once the catalog has loaded
+    reloader = None
+    if args.watch and args.serve:
+        reloader = CatalogReloader(args.catalog, anime_df, anime_index, interval=args.watch_interval).start()
+
+    # The compiled catalog was rewritten while opening it, so there is nothing left to do
+    if args.compile:
+        # Keyword search and description vectors are computed now and stored in the compiled catalog,
+        # so interactive sessions only map them from disk when a search or similar titles are asked for
+        anime_index.search_index()
+        anime_index.similarity_index()
+        print(f"[bold sea_green3]Compiled {len(anime_df)} titles into {catalog_sidecar_path(args.catalog)}[/bold sea_green3]")
         return
-    except pd.errors.EmptyDataError:
-        print("[bold indian_red]Error: The file is empty.[/bold indian_red]")
+
+    # Show the memory footprint of every column and index structure and stop
+    if args.memory_report:
+        show_memory_report(anime_df, anime_index)
         return
-    except pd.errors.ParserError:
-        print("[bold indian_red]Error: There was an issue parsing the file.[/bold indian_red]")
+
+    # Show the best keyword matches and stop
+    if args.search is not None:
+        results = search_anime(anime_df, anime_index, args.search)
+        if results is not None:
+            print(f"[bold italic light_steel_blue]Best matches for [gold1]{args.search}[/gold1]:[/bold italic light_steel_blue]\n")
+            print(anime_recommendation_table(results))
+        else:
+            print(f"[bold dark_orange]Sorry! No anime matches [gold1]{args.search}[/gold1] 😟[/bold dark_orange]")
         return
-    except UnicodeDecodeError:
-        print("[bold indian_red]Error: The file encoding is invalid. Please check the file encoding.[/bold indian_red]")
+
+    # Show the anime matching a genre expression, with the counts before the table
+    if args.genres is not None:
+        try:
+            episode_ranges = [parse_episode_range(label) for label in args.episode_ranges.split(',') if label.strip()]
+            recommendations = get_genre_query_recommendations(anime_df, anime_index, args.genres, episode_ranges)
+        except ValueError as e:
+            print(f"[bold indian_red]Error: Invalid genre query: {e}[/bold indian_red]")
+            return
+        if recommendations is None:
+            print("[bold dark_orange]Sorry! No anime is currently available in our system for the given genres and episode ranges 😟[/bold dark_orange]")
+            return
+        counts = np.bincount(anime_index.range_codes[recommendations.index.to_numpy()] + 1, minlength=len(EPISODE_RANGE_FLAGS) + 1)[1:]
+        breakdown = ', '.join(f"{label}: {count}" for label, count in zip(EPISODE_RANGE_FLAGS, counts) if count)
+        print(f"[bold italic light_steel_blue]Found [gold1]{len(recommendations)}[/gold1] anime matching [gold1]{args.genres}[/gold1] ({breakdown})[/bold italic light_steel_blue]\n")
+        for page in iter_recommendation_pages(recommendations):
+            print(page)
         return
-    except Exception as e:
-        print(f"[bold indian_red]An error occurred while loading the file: {str(e)}[/bold indian_red]")
+
+    # Answer queries in bulk without any menus
+    if args.batch is not None:
+        queries = sys.stdin if args.batch == '-' else open(args.batch, encoding='utf-8')
+        output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+        try:
+            run_batch(anime_df, anime_index, queries, output, workers=args.workers, executor=args.executor, max_buffer_bytes=args.max_buffer_bytes)
+        finally:
+            for stream in (queries, output):
+                if stream not in (sys.stdin, sys.stdout):
+                    stream.close()
+        return
+
+    # Serve the loaded catalog to local clients until interrupted
+    if args.serve:
+        serve(anime_df, anime_index, host=args.host, port=args.port, workers=args.workers, reloader=reloader)
         return
 
-    # Terminal size and separator for display formatting
-    terminal_width = os.get_terminal_size().columns
+    # Replay scripted sessions against the loaded catalog and report their throughput
+    if args.replay is not None:
+        scripts = [read_session_script(path) for path in args.replay]
+        report = replay_sessions(anime_df, anime_index, scripts, sessions=args.sessions, workers=args.workers, feedback_path=args.feedback_file or 'replay_feedback.csv')
+        show_replay_report(report)
+        if args.output != '-':
+            with open(args.output, 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2)
+        return
+
+    # Interactive sessions take the catalog once the background load has finished, and start watching it then
+    def current_catalog(wait=True):
+        nonlocal anime_df, anime_index, reloader
+        if anime_index is None:
+            if not wait:
+                return None, None
+            catalog = pending_catalog.result()
+            if catalog is None:
+                return None
+            anime_df, anime_index = catalog
+        if args.watch and reloader is None:
+            reloader = CatalogReloader(args.catalog, anime_df, anime_index, interval=args.watch_interval).start()
+        return reloader.snapshot if reloader is not None else (anime_df, anime_index)
+
+    run_session(current_catalog, summary, feedback_path=args.feedback_file or 'user_feedback.csv')
+
+
+# Function to run one interactive session: the greeting, rounds of menus until the user exits, and the feedback.
+# catalog() returns the current (df, index), or None when the catalog could not be loaded; catalog(wait=False)
+# returns (None, None) instead of waiting for a catalog still loading, and the menus are then shown from the summary.
+def run_session(catalog, summary=None, feedback_path='user_feedback.csv'):
+    # Terminal size and separator for display formatting, with a default width when there is no terminal
+    terminal_width = shutil.get_terminal_size().columns
     dashed_line = '-' * terminal_width
 
     # Display system greeting
@@ -51,33 +441,44 @@ def main():
 
         print("\n[bold italic light_steel_blue]Please select your preferences so we can recommend the perfect anime for you![/bold italic light_steel_blue]\n")
 
-        # Get genre and episode range preferences from the user
-        genre = get_genre(anime_df)
+        # Every round of menus uses the latest snapshot of a watched catalog
+        anime_df, anime_index = catalog(wait=False)
+
+        # Get genre and episode range preferences from the user, from the summary if the catalog is still loading
+        menu_index = anime_index if anime_index is not None else summary
+        genre = get_genre(anime_df, menu_index)
         print(f"[bold italic light_steel_blue]\nAwesome! Since you prefer [gold1]{genre}[/gold1] let's narrow down your preferences by choosing the story length. Once we have that, we can give you some tailored anime recommendations![/bold italic light_steel_blue]")
 
-        episode_range = get_episode_range(anime_df, genre)
+        episode_range = get_episode_range(anime_df, genre, menu_index)
+
+        # Rows are needed from here on, so wait for the background load if it is still running
+        if anime_index is None:
+            loaded = catalog()
+            if loaded is None:
+                return
+            anime_df, anime_index = loaded
 
         # Get anime recommendations based on the selected preferences
-        recommendations = get_anime_recommendations(anime_df, genre, episode_range)
+        recommendations = get_anime_recommendations(anime_df, genre, episode_range, anime_index)
 
         if recommendations is not None:
             print(f"[bold italic light_steel_blue]\nThanks for your answers! Based on your preferences, here are the anime series we recommend:[/bold italic light_steel_blue]\n")
-            print(anime_recommendation_table(recommendations))
+            show_recommendation_pages(recommendations)
 
             # Ask if the user wants to see a description of the recommended anime
             if len(recommendations) > 1:
-                description = get_choice("\n[bold green1]Would you like to get a description for any of the above recommended anime? (Enter 'Y' for Yes/'N' for No): [/bold green1]")
+                description = get_choice("\n[bold green1]Would you like to get a description for any of the above recommended anime? (Enter 'Y' for Yes/'N' for No): [/bold green1]", step='description?')
             else:
-                description = get_choice("\n[bold green1]Would you like to get a description for the above recommended anime? (Enter 'Y' for Yes/'N' for No): [bold green1]")
+                description = get_choice("\n[bold green1]Would you like to get a description for the above recommended anime? (Enter 'Y' for Yes/'N' for No): [bold green1]", step='description?')
 
             if description:
-                print(anime_description(anime_df, recommendations))
+                show_anime_description(anime_df, recommendations, anime_index)
                 if len(recommendations) > 1:
                     while True:
                         question = "\n[bold green1]Would you like to continue seeing the description for any other anime from above? (Enter 'Y' for Yes/'N' for No): [/bold green1]"
-                        description = get_choice(question)
+                        description = get_choice(question, step='another description?')
                         if description:
-                            print(anime_description(anime_df, recommendations))
+                            show_anime_description(anime_df, recommendations, anime_index)
                         else:
                             break
         else:
@@ -85,7 +486,7 @@ def main():
 
         # Ask if the user wants to go back to the main menu or exit
         return_main_menu_question = "\n[bold green1]Would you like to go back to the main menu to explore more options? (Enter 'Y' to go back to Main menu/Enter 'N' to exit the system): [/bold green1]"
-        choice = get_choice(return_main_menu_question)  # Get user input
+        choice = get_choice(return_main_menu_question, step='main menu?')  # Get user input
         if choice:
             print(f"[bold purple]\n{dashed_line}[/bold purple]")
             continue
@@ -102,17 +503,14 @@ def main():
     print("[italic bold underline orange1]\nTell us what you think?[italic bold underline orange1]")
     # Ask for user feedback if they did not enjoy the system
     user_satisfaction_question = "\n[bold orange1]Did you enjoy the Anime Recommendation System? (Enter 'Y' for Yes/'N' for No): [bold orange1]"
-    liked_system = get_choice(user_satisfaction_question)
+    liked_system = get_choice(user_satisfaction_question, step='enjoyed?')
     if liked_system:
         print("[italic bold orange1]\nWe're so glad you enjoyed it![/italic bold orange1]😊[italic bold orange1] (Feel free to try again anytime!)[/italic bold orange1]")
     else:
         user_suggestion = get_user_feedback()
         try:
-            # Save user feedback to CSV
-            if not os.path.exists('user_feedback.csv'):
-                user_suggestion.to_csv('user_feedback.csv', mode='w', header=True, index=False)
-            else:
-                user_suggestion.to_csv('user_feedback.csv', mode='a', header=False, index=False)
+            # Queue the feedback; it is written to CSV in the background and flushed before the program exits
+            get_feedback_writer(feedback_path).submit(user_suggestion)
             print("[italic bold orange1]\nThank you for your valuable feedback![/italic bold orange1]")
         except Exception as e:
             print(f"[bold indian_red]Error saving feedback: {str(e)}[/bold indian_red]")
@@ -125,11 +523,1558 @@ def main():
     print(f"[bold purple]{dashed_line}[/bold purple]\n")
 
 
+# Function to open the catalog and build its index, reporting any problem with the file to the user
+@profiled
+def load_anime_catalog(args):
+    try:
+        # Read the anime data, preferring an up-to-date compiled catalog over parsing the CSV file.
+        # Only the short columns stay in memory; descriptions and disclaimers are read on demand.
+        anime_df, anime_text = open_catalog(args.catalog, recompile=args.compile)
+
+        # Check for missing or essential columns after reading the file
+        catalog_columns = list(anime_df.columns) + anime_text.columns
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in catalog_columns]
+
+        if missing_columns:
+            print(f"[bold indian_red]Error: Missing required columns: {', '.join(missing_columns)}[/bold indian_red]")
+            return None
+
+        # Build the genre index once so menu steps don't rescan the whole catalog
+        return anime_df, CatalogIndex(anime_df, anime_text)
+
+    except FileNotFoundError:
+        print("[bold indian_red]Error: The specified file was not found.[/bold indian_red]")
+    except pd.errors.EmptyDataError:
+        print("[bold indian_red]Error: The file is empty.[/bold indian_red]")
+    except pd.errors.ParserError:
+        print("[bold indian_red]Error: There was an issue parsing the file.[/bold indian_red]")
+    except UnicodeDecodeError:
+        print("[bold indian_red]Error: The file encoding is invalid. Please check the file encoding.[/bold indian_red]")
+    except Exception as e:
+        print(f"[bold indian_red]An error occurred while loading the file: {str(e)}[/bold indian_red]")
+    return None
+
+
+# Result of a function running on a background daemon thread
+class BackgroundTask:
+    def __init__(self, function, *args):
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+        threading.Thread(target=self._run, args=(function, args), daemon=True).start()
+
+    def _run(self, function, args):
+        try:
+            self._result = function(*args)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._done.set()
+
+    # Wait for the function to finish and return its result, re-raising anything it raised
+    def result(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+# Watcher that follows changes to the catalog CSV file, applying only the rows that changed. Readers take
+# (df, index) from `snapshot` in one read; a reload builds a new pair next to the old one and swaps it in.
+class CatalogReloader:
+    def __init__(self, path, df, index, interval=1.0, max_delta_fraction=0.25):
+        self.path = path
+        self.snapshot = (df, index)
+        self.interval = interval
+        # Beyond this share of changed rows a full reload is cheaper than applying them one by one
+        self.max_delta_fraction = max_delta_fraction
+        self.signature = None
+        # Identity (title and occurrence), content hash and row position of every title in the snapshot
+        self.rows = None
+        self.reloads = 0
+        self.last_change = None
+        self.last_error = None
+        # Rows of the CSV file left out of the snapshot because they could not be parsed
+        self.bad_rows = 0
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        while True:
+            # A file caught half-written or broken keeps the current snapshot until it parses again
+            try:
+                self.check()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            if self._stop.wait(self.interval):
+                return
+
+    # Identify every row by its title and how many times that title appeared before it, and hash its content
+    @staticmethod
+    def row_keys(df):
+        identity = pd.DataFrame({'title': df['title'].astype(str), 'occurrence': df.groupby('title', sort=False, dropna=False).cumcount()})
+        keys = pd.util.hash_pandas_object(identity, index=False, categorize=False)
+        hashes = pd.util.hash_pandas_object(df[[column for column in REQUIRED_COLUMNS if column in df.columns]], index=False, categorize=False)
+        return pd.DataFrame({'key': keys.to_numpy(), 'hash': hashes.to_numpy(), 'position': np.arange(len(df))})
+
+    # Compare the CSV file with the snapshot and swap in a new snapshot if rows were added, changed or removed
+    @profiled
+    def check(self):
+        signature = catalog_source_signature(self.path, with_hash=False)
+        if signature == self.signature:
+            return None
+        started = time.perf_counter()
+        missing_columns = [column for column in REQUIRED_COLUMNS if column not in read_catalog_header(self.path, detect_catalog_encoding(self.path))]
+        if missing_columns:
+            raise ValueError(f"missing required columns: {', '.join(missing_columns)}")
+        skipped = BadRows()
+        source = read_catalog_csv(self.path, skipped)
+        self.bad_rows = skipped.count
+        current = self.row_keys(source)
+        df, index = self.snapshot
+
+        # The first look at the file only records it, as long as it is the one the snapshot was loaded from
+        if self.rows is None:
+            if len(source) == index.size and np.array_equal(source['title'].to_numpy(dtype=object), np.asarray(index.titles, dtype=object)):
+                self.signature = signature
+                self.rows = current.rename(columns={'position': 'row'})
+                return None
+            return self.full_reload(signature, current, started)
+
+        merged = self.rows.merge(current, on='key', how='outer', suffixes=('_old', ''), indicator=True)
+        removed = merged.loc[merged['_merge'] == 'left_only', 'row'].to_numpy(dtype=np.int64)
+        changed = merged[(merged['_merge'] == 'both') & (merged['hash_old'] != merged['hash'])]
+        added = merged[merged['_merge'] == 'right_only']
+        delta = len(removed) + len(changed) + len(added)
+        if delta == 0:
+            self.signature = signature
+            return None
+        if delta > self.max_delta_fraction * max(len(current), 1):
+            return self.full_reload(signature, current, started)
+        parsed = time.perf_counter()
+
+        # Copy-on-write: changed rows keep their position in a copy of the dataframe, added rows go after the last one
+        changed_rows = changed['row'].to_numpy(dtype=np.int64)
+        added_rows = np.arange(index.size, index.size + len(added))
+        updated_rows = np.concatenate([changed_rows, added_rows])
+        positions = np.concatenate([changed['position'].to_numpy(dtype=np.int64), added['position'].to_numpy(dtype=np.int64)])
+        resident = list(df.columns)
+        new_df = df.copy()
+        updates = source[[column for column in resident if column in source.columns]].iloc[positions]
+        # Episode counts are only extracted for the rows that changed
+        if EPISODE_COUNT_COLUMN in resident:
+            updates = updates.assign(**{EPISODE_COUNT_COLUMN: extract_episode_counts(source['description'].iloc[positions])})
+        # Categorical columns learn new genre lists and labels first, so they stay categorical
+        for column in resident:
+            if isinstance(new_df[column].dtype, pd.CategoricalDtype):
+                categories = new_df[column].cat.categories
+                unseen = [value for value in pd.unique(updates[column].dropna().to_numpy(dtype=object)) if value not in categories]
+                if unseen:
+                    dtype = pd.CategoricalDtype(categories.append(pd.Index(unseen, dtype=categories.dtype)))
+                    new_df[column] = pd.Categorical.from_codes(new_df[column].array.codes, dtype=dtype)
+                updates = updates.assign(**{column: pd.Categorical(updates[column].to_numpy(dtype=object), dtype=new_df[column].dtype)})
+        if len(changed_rows):
+            for column in resident:
+                new_df.iloc[changed_rows, new_df.columns.get_loc(column)] = updates[column].iloc[:len(changed_rows)].to_numpy()
+        if len(added_rows):
+            new_df = pd.concat([new_df, updates.iloc[len(changed_rows):]], ignore_index=True)
+
+        text = index.text
+        if text is not None:
+            rows = {int(row): {} for row in removed}
+            for row, position in zip(updated_rows, positions):
+                rows[int(row)] = {column: None if pd.isna(value) else value for column, value in source[text.columns].iloc[position].items()}
+            text = text.with_rows(rows)
+        new_index = index.with_changes(new_df, text, updated_rows, removed)
+        if new_index is None:
+            return self.full_reload(signature, current, started)
+
+        kept = merged[merged['_merge'] != 'left_only'].copy()
+        kept.loc[kept['_merge'] == 'right_only', 'row'] = added_rows
+        self.rows = kept[['key', 'hash', 'row']].astype({'row': np.int64}).reset_index(drop=True)
+        self.snapshot = (new_df, new_index)
+        self.signature = signature
+        self.reloads += 1
+        self.last_change = {
+            'added': len(added), 'changed': len(changed), 'removed': len(removed), 'full': False,
+            'parse_seconds': round(parsed - started, 6), 'apply_seconds': round(time.perf_counter() - parsed, 6)
+        }
+        return self.last_change
+
+    # Load the whole catalog again, for first looks at a different file and for changes too large to apply row by row
+    def full_reload(self, signature, current, started):
+        df, text = open_catalog(self.path)
+        self.snapshot = (df, CatalogIndex(df, text))
+        self.rows = current.rename(columns={'position': 'row'})
+        self.signature = signature
+        self.reloads += 1
+        self.last_change = {'added': 0, 'changed': 0, 'removed': 0, 'full': True, 'parse_seconds': round(time.perf_counter() - started, 6), 'apply_seconds': 0.0}
+        return self.last_change
+
+    # Reload counts and the last change, for monitoring
+    def stats(self):
+        return {'version': self.snapshot[1].version, 'titles': self.snapshot[1].size - len(self.snapshot[1].removed_rows), 'reloads': self.reloads, 'last_change': self.last_change, 'last_error': self.last_error, 'bad_rows': self.bad_rows}
+
+
+# Function to count the bytes held by an array of Python objects: its pointers plus every distinct object once
+def object_bytes(values):
+    values = np.asarray(values, dtype=object)
+    distinct = {id(value): value for value in values}
+    return values.nbytes + sum(sys.getsizeof(value) for value in distinct.values())
+
+
+# Function to count the bytes a column would take as one Python string object per row, as pandas reads it by default
+def object_string_bytes(values):
+    values = np.asarray(values, dtype=object)
+    sizes = {}
+    return values.nbytes + sum(sizes.setdefault(id(value), sys.getsizeof(value)) for value in values)
+
+
+# Function to measure the resident memory of the loaded catalog, per column and per index structure, next to
+# what the same columns would take as plain object strings
+@profiled
+def catalog_memory_report(df, index):
+    rows = []
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.array.codes
+            category_sizes = np.array([sys.getsizeof(category) for category in values.cat.categories] + [sys.getsizeof(None)])
+            resident = codes.nbytes + object_bytes(values.cat.categories.to_numpy())
+            as_strings = codes.nbytes // codes.itemsize * 8 + int(category_sizes[codes].sum())
+            rows.append((column, f"{codes.dtype} codes, {len(values.cat.categories):,} values", resident, as_strings))
+        elif values.dtype.kind in 'iu':
+            rows.append((column, f"{values.dtype} values", values.to_numpy().nbytes, None))
+        else:
+            rows.append((column, "object strings", object_bytes(values.to_numpy()), object_string_bytes(values.to_numpy())))
+
+    # Text columns mapped from the compiled catalog live in the OS page cache, not in the process
+    if index.text is not None:
+        for column, (offsets, data, nulls) in index.text.arrays.items():
+            mapped = isinstance(data, np.memmap)
+            stored = offsets.nbytes + data.nbytes + nulls.nbytes
+            as_strings = len(nulls) * (8 + sys.getsizeof('')) + data.nbytes
+            rows.append((column, "memory-mapped UTF-8 blob" if mapped else "UTF-8 blob", 0 if mapped else stored, as_strings))
+
+    # Index structures, counting code arrays shared with the dataframe only once
+    shared = [values.array.codes if isinstance(values.dtype, pd.CategoricalDtype) else values.to_numpy() for _, values in df.items() if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype.kind in 'iu']
+    codes = [array for array in (index.combo_codes, index.range_codes, index.episode_counts) if not any(np.shares_memory(array, other) for other in shared)]
+    lookup = index.title_rows.maps[-1] if isinstance(index.title_rows, collections.ChainMap) else index.title_rows
+    rows.append(("index: title lookup", "sorted 64-bit title hashes", index.titles.nbytes + lookup.hashes.nbytes + lookup.rows.nbytes, None))
+    rows.append(("index: genre row sets", f"{len(index.genre_rows)} sorted {index.row_dtype.__name__} arrays", sum(rows_.nbytes for rows_ in index.genre_rows.values()), None))
+    rows.append(("index: row codes", "shared with the dataframe" if not codes else "own arrays", sum(array.nbytes for array in codes), None))
+    rows.append(("index: episode count order", "sorted 64-bit count and row keys", index.episode_keys.nbytes, None))
+    rows.append(("index: facet cube", f"{len(index.combo_genres):,} genre lists x {len(index.episode_ranges)} ranges", index.combo_counts.nbytes + index.facet_counts.nbytes + index.combo_membership.nbytes, None))
+    return rows
+
+
+# Function to write a byte count in the largest unit that keeps it above one
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:,.1f} {unit}"
+        size /= 1024
+    return f"{size:,.1f} GB"
+
+
+# Function to print the memory report of the loaded catalog
+def show_memory_report(df, index):
+    from tabulate import tabulate
+
+    rows = catalog_memory_report(df, index)
+    resident = sum(row[2] for row in rows)
+    as_strings = sum(row[3] for row in rows if row[3] is not None)
+    table = [(name, stored_as, format_bytes(size), "" if plain is None else format_bytes(plain)) for name, stored_as, size, plain in rows]
+    table.append(("total", "", format_bytes(resident), format_bytes(as_strings)))
+    print(tabulate(table, headers=["Column / structure", "Stored as", "Resident", "As strings"], tablefmt="simple", colalign=("left", "left", "right", "right")))
+    print(f"\n[bold sea_green3]{index.size:,} titles take {format_bytes(resident)} resident, {as_strings / max(resident, 1):.1f}x less than the catalog as object strings[/bold sea_green3]")
+
+
+# Function to turn on the stage timers, and cProfile if a trace is wanted, reporting them when the program exits
+def start_profiling(trace=None, folded=None):
+    PROFILER.enable()
+    profile = None
+    if trace:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+    atexit.register(write_profile_report, profile, trace, folded)
+
+
+# Function to print the per-stage latency summary and write the requested traces
+def write_profile_report(profile=None, trace=None, folded=None, stream=None):
+    from tabulate import tabulate
+
+    stream = stream if stream is not None else sys.stderr
+    if profile is not None:
+        profile.disable()
+        profile.dump_stats(trace)
+    if folded:
+        with open(folded, 'w', encoding='utf-8') as folded_file:
+            folded_file.write(PROFILER.folded())
+
+    report = PROFILER.snapshot()
+    rows = [(name, *stage.values()) for name, stage in report['stages'].items()]
+    headers = ["Stage", "Calls", "Total ms", "Mean ms", "p50 ms", "p90 ms", "p99 ms"]
+    builtins.print("\nProfile (time waiting for input is left out of the other stages):", file=stream)
+    builtins.print(tabulate(rows, headers=headers, tablefmt="simple", floatfmt=".3f"), file=stream)
+    if report['counters']:
+        builtins.print(tabulate(sorted(report['counters'].items()), headers=["Counter", "Value"], tablefmt="simple"), file=stream)
+    builtins.print(tabulate(RESULT_CACHE.stats().items(), headers=["Result cache", "Value"], tablefmt="simple"), file=stream)
+
+
+# Function to read the command line options
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Anime Recommendation System")
+    parser.add_argument("--catalog", default="anime_data.csv", help="path to the anime catalog CSV file")
+    parser.add_argument("--compile", action="store_true", help="compile the catalog into a binary sidecar for faster startup and exit")
+    parser.add_argument("--search", metavar="KEYWORDS", help="search titles, descriptions and disclaimers by keyword (end a word with * to match prefixes) and exit")
+    parser.add_argument("--genres", metavar="QUERY", help='recommend anime matching a genre expression such as "Action AND Comedy, NOT Horror" and exit')
+    parser.add_argument("--episode-ranges", default="", help="comma-separated episode ranges for --genres, as presets or numbers of episodes, e.g. Short,Medium or 10-40 (default: all)")
+    parser.add_argument("--batch", metavar="QUERIES", help="answer (genre, episode_range) queries from a file ('-' for stdin) as JSON lines and exit")
+    parser.add_argument("--output", default="-", help="where batch results, or the replay report as JSON, are written ('-' for stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of batch workers, or of sessions replayed at once")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread", help="run batch workers as threads or processes")
+    parser.add_argument("--serve", action="store_true", help="serve recommendations over HTTP on localhost until interrupted")
+    parser.add_argument("--host", default="127.0.0.1", help="address the recommendation service listens on")
+    parser.add_argument("--port", type=int, default=8000, help="port the recommendation service listens on")
+    parser.add_argument("--max-buffer-bytes", type=int, default=64 * 1024 * 1024, help="upper bound on finished batch results held back to keep the output in input order")
+    parser.add_argument("--replay", metavar="SCRIPT", nargs="+", help="replay scripted sessions, one answer per line, against the catalog without a terminal and report their throughput")
+    parser.add_argument("--sessions", type=int, help="number of sessions to replay, cycling through the scripts (default: one per script)")
+    parser.add_argument("--feedback-file", help="file feedback is appended to (default: user_feedback.csv, or replay_feedback.csv for --replay)")
+    parser.add_argument("--memory-report", action="store_true", help="show how much memory each column and index structure of the catalog takes and exit")
+    parser.add_argument("--watch", action="store_true", help="apply edits to the catalog file while the service or an interactive session is running")
+    parser.add_argument("--watch-interval", type=float, default=1.0, help="seconds between checks of the watched catalog file")
+    parser.add_argument("--profile", action="store_true", help="print how long each stage took when the program exits")
+    parser.add_argument("--profile-trace", metavar="FILE", help="also write a cProfile trace of the main thread to FILE (implies --profile)")
+    parser.add_argument("--profile-folded", metavar="FILE", help="also write the stage stacks in folded flame graph format to FILE (implies --profile)")
+    return parser.parse_args(argv)
+
+
+# Function to find the encoding of a catalog CSV file: a byte order mark, else UTF-8, else a Windows or Latin-1 code page
+def detect_catalog_encoding(path):
+    with open(path, 'rb') as source:
+        start = source.read(4)
+        if start.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if start.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+
+        # Without a byte order mark, the file is UTF-8 if every block decodes as such, checked block by block
+        source.seek(0)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            for block in iter(lambda: source.read(1 << 20), b''):
+                decoder.decode(block)
+            decoder.decode(b'', final=True)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+
+        # Otherwise prefer Windows-1252, which the shipped catalog uses for dashes and quotes, unless the file
+        # holds one of the five bytes it leaves undefined; ISO-8859-1 decodes anything
+        source.seek(0)
+        for block in iter(lambda: source.read(1 << 20), b''):
+            if any(byte in block for byte in (b'\x81', b'\x8d', b'\x8f', b'\x90', b'\x9d')):
+                return 'ISO-8859-1'
+        return 'cp1252'
+
+
+# Function to read the column names of a catalog CSV file, raising EmptyDataError for a file without any
+def read_catalog_header(path, encoding):
+    with open(path, encoding=encoding, newline='') as source:
+        header = next(csv.reader(source), None)
+    if not header:
+        raise pd.errors.EmptyDataError("No columns to parse from file")
+    return [column.strip() for column in header]
+
+
+# Bad rows found while reading a catalog CSV file: how many there were, and the first few with their line numbers
+class BadRows:
+    def __init__(self, kept=BAD_ROWS_KEPT):
+        self.count = 0
+        self.rows = []
+        self.kept = kept
+
+    def add(self, line, error):
+        self.count += 1
+        if len(self.rows) < self.kept:
+            self.rows.append({'line': line, 'error': error})
+
+
+# Function to stream the rows of a catalog CSV file in chunks of at most `chunk_rows`, as {column: list of values}
+# with empty fields as None. Rows that cannot be used are left out and added to `skipped` with their line number.
+def iter_catalog_chunks(path, encoding, header, chunk_rows=CATALOG_CHUNK_ROWS, skipped=None):
+    skipped = skipped if skipped is not None else BadRows()
+    # Oversized fields are reported as bad rows instead of being buffered whole
+    csv.field_size_limit(CATALOG_FIELD_LIMIT)
+    title_position = header.index('title') if 'title' in header else None
+    with open(path, encoding=encoding, newline='') as source:
+        reader = csv.reader(source)
+        next(reader, None)
+        rows = []
+        while True:
+            line = reader.line_num + 1
+            try:
+                record = next(reader)
+            except StopIteration:
+                break
+            except csv.Error as e:
+                skipped.add(line, str(e))
+                continue
+            if not record:
+                continue
+            if len(record) != len(header):
+                skipped.add(line, f"expected {len(header)} fields, saw {len(record)}")
+                continue
+            values = [value if value != '' else None for value in record]
+            if title_position is not None and values[title_position] is None:
+                skipped.add(line, "missing title")
+                continue
+            rows.append(values)
+            if len(rows) == chunk_rows:
+                PROFILER.count('csv_rows_parsed', len(rows))
+                yield dict(zip(header, map(list, zip(*rows))))
+                rows = []
+        if rows:
+            PROFILER.count('csv_rows_parsed', len(rows))
+            yield dict(zip(header, map(list, zip(*rows))))
+
+
+# Function to read a whole catalog CSV file into a dataframe, chunk by chunk
+@profiled
+def read_catalog_csv(path, skipped=None):
+    encoding = detect_catalog_encoding(path)
+    header = read_catalog_header(path, encoding)
+    chunks = [pd.DataFrame(chunk, columns=header) for chunk in iter_catalog_chunks(path, encoding, header, skipped=skipped)]
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame({column: [] for column in header}, dtype=object)
+
+
+# Function to extract the total number of episodes from a description: the count in a sentence about the total,
+# else the largest count mentioned, since no season or part has more episodes than the whole. -1 when there is none.
+def extract_episode_count(description):
+    if not isinstance(description, str):
+        return -1
+    text = description.lower()
+
+    # Find the word "episodes" with plain string search and only run the pattern on the few characters before it,
+    # which is far cheaper than scanning whole descriptions with a regular expression
+    counts = []
+    position = text.find('episodes')
+    while position >= 0:
+        match = EPISODE_COUNT_PATTERN.search(text[max(0, position - 24):position])
+        if match:
+            counts.append((position, int(match.group(1).replace(',', ''))))
+        position = text.find('episodes', position + 8)
+
+    # The first sentence about the total that gives a number wins
+    position = text.find('total')
+    while position >= 0:
+        start = max(text.rfind('.', 0, position), text.rfind('\n', 0, position)) + 1
+        end = min((boundary for boundary in (text.find('.', position), text.find('\n', position)) if boundary >= 0), default=len(text))
+        in_sentence = [count for at, count in counts if start <= at < end]
+        if in_sentence:
+            return in_sentence[0]
+        match = EPISODE_TOTAL_IS_PATTERN.search(text, start, end)
+        if match:
+            return int(match.group(1).replace(',', ''))
+        position = text.find('total', end)
+    return max((count for _, count in counts), default=-1)
+
+
+# Function to extract the episode counts of many descriptions into an int32 array
+def extract_episode_counts(descriptions):
+    return np.fromiter((extract_episode_count(description) for description in descriptions), dtype=np.int32)
+
+
+# Function to code every title with the episode range preset its episode count falls in, keeping the code of the
+# catalog's own episode range label for titles whose count is unknown
+def preset_range_codes(episode_counts, label_codes):
+    lower_bounds = [low for low, _ in EPISODE_RANGE_BOUNDS.values()]
+    codes = np.searchsorted(lower_bounds, episode_counts, side='right') - 1
+    return np.where(episode_counts >= lower_bounds[0], codes, label_codes).astype(label_codes.dtype, copy=False)
+
+
+# Function to read an episode range typed by the user: a preset such as "Long", returned as its label, or a number
+# of episodes such as "10-40" or "100+", returned as (low, high) with None for no upper bound
+def parse_episode_range(text):
+    text = str(text).strip()
+    for label in EPISODE_RANGE_FLAGS:
+        if text.lower() == label.lower():
+            return label
+    match = EPISODE_QUERY_PATTERN.fullmatch(text)
+    if match is None:
+        raise ValueError(f"unknown episode range {text}")
+    low = int(match.group(1))
+    high = None if match.group(3) else int(match.group(2) or low)
+    if high is not None and high < low:
+        raise ValueError(f"episode range {text} ends before it starts")
+    return low, high
+
+
+# Function to store the columns with few distinct values as categoricals, keeping episode ranges in menu order
+def compact_catalog(df):
+    columns = {}
+    for column in CATEGORICAL_COLUMNS:
+        if column not in df.columns or isinstance(df[column].dtype, pd.CategoricalDtype):
+            continue
+        categories = pd.unique(df[column].dropna().to_numpy(dtype=object))
+        if column == 'episode_range':
+            categories = list(EPISODE_RANGE_FLAGS) + [label for label in categories if label not in EPISODE_RANGE_FLAGS]
+        columns[column] = pd.Categorical(df[column].to_numpy(dtype=object), categories=categories)
+    return df.assign(**columns)
+
+
+# Function to get the directory holding the compiled form of a catalog CSV file
+def catalog_sidecar_path(path):
+    return os.path.splitext(path)[0] + '.catalog'
+
+
+# Function to describe the source file so a compiled catalog can tell whether it is stale
+def catalog_source_signature(path, with_hash=True):
+    stat = os.stat(path)
+    signature = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as source:
+            for block in iter(lambda: source.read(1 << 20), b''):
+                digest.update(block)
+        signature['sha256'] = digest.hexdigest()
+    return signature
+
+
+# Function to encode a column as a UTF-8 byte blob, row offsets into it and a null mask
+def encode_text_column(values):
+    nulls = np.asarray(pd.isna(values), dtype=bool)
+    encoded = [b'' if null else str(value).encode('utf-8') for value, null in zip(values, nulls)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8), nulls
+
+
+# Appends the values of one column to its UTF-8 blob, row offsets and null mask files, one chunk at a time
+class ColumnWriter:
+    def __init__(self, directory, column):
+        self.files = {part: open(os.path.join(directory, f"{column}.{part}.bin"), 'wb') for part in ('offsets', 'data', 'nulls')}
+        self.size = 0
+        self.files['offsets'].write(np.zeros(1, dtype=np.int64).tobytes())
+
+    def append(self, values):
+        offsets, data, nulls = encode_text_column(values)
+        self.files['offsets'].write((offsets[1:] + self.size).tobytes())
+        self.files['data'].write(data.tobytes())
+        self.files['nulls'].write(nulls.tobytes())
+        self.size += len(data)
+
+    def close(self):
+        for part_file in self.files.values():
+            part_file.close()
+
+
+# Function to write the catalog as columnar UTF-8 blobs with row offsets, next to the CSV file. The CSV file is
+# streamed chunk by chunk: every chunk is appended to the column files, coded against the distinct genre lists
+# and episode ranges seen so far, has its episode counts extracted and is added to the facet counts, so memory
+# does not grow with the file.
+@profiled
+def compile_catalog(path, source=None, encoding=None, chunk_rows=CATALOG_CHUNK_ROWS):
+    # Sign the CSV file before reading it, so a change made meanwhile leaves the catalog stale instead of wrongly fresh
+    if source is None:
+        source = catalog_source_signature(path)
+    encoding = encoding or detect_catalog_encoding(path)
+    header = read_catalog_header(path, encoding)
+
+    sidecar = catalog_sidecar_path(path)
+    staging = f"{sidecar}.tmp{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    try:
+        files = contextlib.ExitStack()
+        # Categorical columns store codes into their distinct values, with episode ranges in menu order
+        categorical = [column for column in CATEGORICAL_COLUMNS if column in header]
+        categories = {column: {} for column in categorical}
+        if 'episode_range' in categories:
+            categories['episode_range'] = {label: code for code, label in enumerate(EPISODE_RANGE_FLAGS)}
+        writers = {column: files.enter_context(contextlib.closing(ColumnWriter(staging, column))) for column in header if column not in categorical}
+        code_files = {column: files.enter_context(open(os.path.join(staging, f"{column}.codes.bin"), 'wb')) for column in categorical}
+        # Episode counts are extracted from the descriptions and stored as a plain int32 array
+        derived = [EPISODE_COUNT_COLUMN] if 'description' in header else []
+        count_file = files.enter_context(open(os.path.join(staging, f"{EPISODE_COUNT_COLUMN}.bin"), 'wb')) if derived else None
+        combo_counts = np.zeros((0, len(EPISODE_RANGE_FLAGS)), dtype=np.int64)
+        skipped = BadRows()
+        rows = 0
+
+        for chunk in iter_catalog_chunks(path, encoding, header, chunk_rows, skipped):
+            rows += len(chunk[header[0]])
+            codes = {}
+            for column in header:
+                if column in writers:
+                    writers[column].append(chunk[column])
+                    continue
+                chunk_codes, uniques = pd.factorize(np.asarray(chunk[column], dtype=object))
+                known = categories[column]
+                mapping = np.array([known.setdefault(value, len(known)) for value in uniques] + [-1], dtype=np.int32)
+                codes[column] = mapping[chunk_codes]
+                code_files[column].write(codes[column].tobytes())
+            episode_counts = None
+            if count_file is not None:
+                episode_counts = extract_episode_counts(chunk['description'])
+                count_file.write(episode_counts.tobytes())
+
+            # Count the titles of each genre list and episode range preset, growing the counts with new genre lists
+            if 'genre' in codes and 'episode_range' in codes:
+                genre_codes, range_codes = codes['genre'], codes['episode_range']
+                if episode_counts is not None:
+                    range_codes = preset_range_codes(episode_counts, range_codes)
+                counted = (genre_codes >= 0) & (range_codes >= 0) & (range_codes < len(EPISODE_RANGE_FLAGS))
+                cells = genre_codes[counted].astype(np.int64) * len(EPISODE_RANGE_FLAGS) + range_codes[counted]
+                chunk_counts = np.bincount(cells, minlength=len(categories['genre']) * len(EPISODE_RANGE_FLAGS)).reshape(-1, len(EPISODE_RANGE_FLAGS))
+                combo_counts = np.vstack([combo_counts, np.zeros((len(chunk_counts) - len(combo_counts), len(EPISODE_RANGE_FLAGS)), dtype=np.int64)]) + chunk_counts
+
+        # The distinct values of the categorical columns are stored like any other column
+        for column in categorical:
+            writer = files.enter_context(contextlib.closing(ColumnWriter(staging, column)))
+            writer.append(list(categories[column]))
+        files.close()
+
+        manifest = {
+            'format_version': CATALOG_FORMAT_VERSION,
+            'source': source,
+            'encoding': encoding,
+            'rows': rows,
+            'columns': header,
+            'categorical': categorical,
+            'derived': derived,
+            'bad_rows': {'count': skipped.count, 'first': skipped.rows},
+        }
+
+        # A small summary lets the genre and story length menus be shown without loading pandas or the catalog
+        if 'genre' in categories and 'episode_range' in categories:
+            genres, genre_ids = [], {}
+            combo_genres = split_genre_lists(categories['genre'], genres, genre_ids)
+            membership = np.zeros((len(combo_genres), len(genres)), dtype=np.int64)
+            for combo, ids in enumerate(combo_genres):
+                membership[combo, ids] = 1
+            manifest['summary'] = {
+                'genres': genres,
+                'episode_ranges': list(EPISODE_RANGE_FLAGS),
+                'combo_genres': combo_genres,
+                'combo_counts': combo_counts.tolist(),
+                'facet_counts': (membership.T @ combo_counts).tolist(),
+            }
+        with open(os.path.join(staging, 'manifest.json'), 'w', encoding='utf-8') as manifest_file:
+            json.dump(manifest, manifest_file)
+    except BaseException:
+        files.close()
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Swap the finished directory into place so readers never see a half-written catalog
+    retired = f"{sidecar}.old{os.getpid()}"
+    if os.path.exists(sidecar):
+        os.replace(sidecar, retired)
+    os.replace(staging, sidecar)
+    shutil.rmtree(retired, ignore_errors=True)
+    report_bad_rows(path, skipped)
+    return sidecar
+
+
+# Function to tell the user which rows of the catalog CSV file were left out, on stderr so batch output stays clean
+def report_bad_rows(path, skipped):
+    if skipped.count == 0:
+        return
+    print(f"[bold dark_orange]Skipped {skipped.count} bad rows of {path}:[/bold dark_orange]", file=sys.stderr)
+    for bad_row in skipped.rows[:BAD_ROWS_PRINTED]:
+        print(f"[dark_orange]  line {bad_row['line']}: {bad_row['error']}[/dark_orange]", file=sys.stderr)
+    if skipped.count > BAD_ROWS_PRINTED:
+        print(f"[dark_orange]  ... and {skipped.count - BAD_ROWS_PRINTED} more[/dark_orange]", file=sys.stderr)
+
+
+# Function to read the manifest of a compiled catalog if it still matches its source CSV file
+def read_fresh_manifest(path):
+    try:
+        with open(os.path.join(catalog_sidecar_path(path), 'manifest.json'), encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('format_version') != CATALOG_FORMAT_VERSION:
+        return None
+
+    # Matching size and mtime is enough; otherwise fall back to comparing content hashes
+    compiled = manifest.get('source', {})
+    current = catalog_source_signature(path, with_hash=False)
+    if current['size'] != compiled.get('size'):
+        return None
+    if current['mtime_ns'] != compiled.get('mtime_ns'):
+        if catalog_source_signature(path)['sha256'] != compiled.get('sha256'):
+            return None
+        # Same content with a new mtime (a touch or a copy): remember the new mtime so later starts skip the hash
+        manifest['source'] = {**compiled, 'mtime_ns': current['mtime_ns']}
+        manifest_path = os.path.join(catalog_sidecar_path(path), 'manifest.json')
+        try:
+            with open(f"{manifest_path}.tmp{os.getpid()}", 'w', encoding='utf-8') as manifest_file:
+                json.dump(manifest, manifest_file)
+            os.replace(f"{manifest_path}.tmp{os.getpid()}", manifest_path)
+        except OSError:
+            pass
+    return manifest
+
+
+# Function to read the menu summary of a fresh compiled catalog, or None when there is none
+def read_catalog_summary(path):
+    try:
+        manifest = read_fresh_manifest(path)
+    except OSError:
+        return None
+    if manifest is None or 'summary' not in manifest:
+        return None
+    return CatalogSummary(manifest['summary'])
+
+
+# Genre list and facet counts of a compiled catalog, answering the menus with plain Python lists
+class CatalogSummary:
+    def __init__(self, summary):
+        self.genres = summary['genres']
+        self.episode_ranges = summary['episode_ranges']
+        self.genre_ids = {genre.lower(): i for i, genre in enumerate(self.genres)}
+        self.combo_genres = summary['combo_genres']
+        self.combo_counts = summary['combo_counts']
+        self.facet_counts = summary['facet_counts']
+
+    # Return the number of titles per episode range that carry every one of the given genres
+    def availability(self, genres):
+        if isinstance(genres, str):
+            genres = [genres]
+        genre_ids = [self.genre_ids.get(str(genre).strip().lower()) for genre in genres]
+        if not genre_ids or None in genre_ids:
+            return [0] * len(self.episode_ranges)
+        if len(genre_ids) == 1:
+            return self.facet_counts[genre_ids[0]]
+        counts = [0] * len(self.episode_ranges)
+        for combo, combo_counts in zip(self.combo_genres, self.combo_counts):
+            if all(genre_id in combo for genre_id in genre_ids):
+                counts = [total + count for total, count in zip(counts, combo_counts)]
+        return counts
+
+
+# Function to map one array file of a compiled catalog read-only, shared with other processes through the OS page cache
+def map_compiled_array(sidecar, name, dtype):
+    path = os.path.join(sidecar, name)
+    # An empty file cannot be memory-mapped, and there is nothing in it to share
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+# Function to map the blob, row offsets and null mask of one compiled column
+def map_compiled_column(sidecar, column):
+    return tuple(map_compiled_array(sidecar, f"{column}.{part}.bin", dtype) for part, dtype in (('offsets', np.int64), ('data', np.uint8), ('nulls', bool)))
+
+
+# Function to decode one compiled column back into a list of values, or a categorical for columns stored as codes
+def read_compiled_column(sidecar, column):
+    offsets, data, nulls = map_compiled_column(sidecar, column)
+    data = data.tobytes()
+    values = [None if null else data[start:end].decode('utf-8') for start, end, null in zip(offsets[:-1].tolist(), offsets[1:].tolist(), nulls)]
+    codes_path = os.path.join(sidecar, f"{column}.codes.bin")
+    if os.path.exists(codes_path):
+        return pd.Categorical.from_codes(np.fromfile(codes_path, dtype=np.int32), categories=values)
+    return values
+
+
+# Function to open the catalog with only the short columns resident and the long text columns memory-mapped
+@profiled
+def open_catalog(path, recompile=False):
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+
+    # Refresh the compiled catalog from the CSV file when it is stale, as long as the CSV file is usable
+    manifest = None if recompile else read_fresh_manifest(path)
+    if manifest is None:
+        source = catalog_source_signature(path)
+        encoding = detect_catalog_encoding(path)
+
+        # Check the columns before reading any row, returning just the column names when some are missing
+        header = read_catalog_header(path, encoding)
+        if any(col not in header for col in REQUIRED_COLUMNS):
+            return pd.DataFrame({column: [] for column in header if column not in TEXT_COLUMNS}), TextStore({})
+        try:
+            compile_catalog(path, source, encoding)
+            manifest = read_fresh_manifest(path)
+        except OSError:
+            manifest = None
+
+        # Without a compiled catalog on disk, keep the text columns as compact in-memory blobs instead
+        if manifest is None:
+            skipped = BadRows()
+            df = read_catalog_csv(path, skipped)
+            report_bad_rows(path, skipped)
+            resident = df.drop(columns=TEXT_COLUMNS).assign(**{EPISODE_COUNT_COLUMN: extract_episode_counts(df['description'])})
+            return compact_catalog(resident), TextStore.from_dataframe(df, TEXT_COLUMNS)
+
+    sidecar = catalog_sidecar_path(path)
+    resident_columns = [column for column in manifest['columns'] if column not in TEXT_COLUMNS]
+    df = pd.DataFrame({column: read_compiled_column(sidecar, column) for column in resident_columns})
+    for column in manifest.get('derived', []):
+        df[column] = np.fromfile(os.path.join(sidecar, f"{column}.bin"), dtype=np.int32)
+    text_columns = [column for column in manifest['columns'] if column in TEXT_COLUMNS]
+    return df, TextStore.from_sidecar(sidecar, text_columns)
+
+
+# Offset-indexed text columns that decode a single row on demand
+class TextStore:
+    def __init__(self, columns, sidecar=None, overrides=None):
+        # Each column maps to its (offsets, data, nulls) arrays, which may be memory-mapped
+        self.arrays = columns
+        self.columns = list(columns)
+        # Compiled catalog directory the columns were mapped from, if any
+        self.sidecar = sidecar
+        # Rows changed or added since the columns were encoded, as {row: {column: value}}
+        self.overrides = overrides or {}
+
+    # Open the text columns of a compiled catalog as read-only memory maps shared through the OS page cache
+    @classmethod
+    def from_sidecar(cls, sidecar, columns):
+        return cls({column: map_compiled_column(sidecar, column) for column in columns}, sidecar)
+
+    # Encode the text columns of a dataframe into in-memory blobs
+    @classmethod
+    def from_dataframe(cls, df, columns):
+        return cls({column: encode_text_column(df[column].to_numpy()) for column in columns if column in df.columns})
+
+    # Return a copy of the store with some rows replaced, sharing the encoded columns with this one
+    def with_rows(self, rows):
+        overrides = dict(self.overrides)
+        overrides.update(rows)
+        # The copy no longer matches the compiled catalog, so indexes saved there must not be used for it
+        return TextStore(self.arrays, None, overrides)
+
+    # Pickle memory-mapped columns as their catalog directory, so they are mapped again rather than copied
+    def __getstate__(self):
+        if self.sidecar is None:
+            return self.__dict__
+        return {'columns': self.columns, 'sidecar': self.sidecar, 'overrides': self.overrides}
+
+    def __setstate__(self, state):
+        if 'arrays' not in state:
+            state = {**TextStore.from_sidecar(state['sidecar'], state['columns']).__dict__, 'overrides': state.get('overrides', {})}
+        self.__dict__.update(state)
+
+    # Decode one row of a text column, returning None for missing values
+    def get(self, row, column):
+        if row in self.overrides:
+            return self.overrides[row].get(column)
+        offsets, data, nulls = self.arrays[column]
+        if nulls[row]:
+            return None
+        return data[offsets[row]:offsets[row + 1]].tobytes().decode('utf-8')
+
+
+# TF-IDF vectors over unigrams and bigrams of the descriptions, kept as float32 sparse rows and columns
+class SimilarityIndex:
+    @profiled
+    def __init__(self, documents=None, max_document_frequency=0.5):
+        if documents is None:
+            return
+
+        # Tokenize and count the descriptions a chunk at a time, so only one chunk of them is ever held as Python
+        # strings; the whole catalog is only kept as compact (description, feature, count) triples
+        vocabulary = {}
+        known_keys = known_ids = np.empty(0, dtype=np.int64)
+        row_parts, col_parts, count_parts = [], [], []
+        documents = iter(documents)
+        self.size = self.n_features = 0
+        while chunk := list(itertools.islice(documents, SIMILARITY_CHUNK_ROWS)):
+            tokens = pd.Series(chunk, dtype=object).fillna('').str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+            tokens = tokens[~tokens.isin(STOP_WORDS)]
+            local_codes, local_terms = pd.factorize(tokens.to_numpy())
+            codes = np.array([vocabulary.setdefault(term, len(vocabulary)) for term in local_terms], dtype=np.int64)[local_codes]
+            docs = tokens.index.to_numpy(dtype=np.int64)
+
+            # Pair consecutive tokens of the same description into bigram keys, flagged apart from the unigram codes
+            same_doc = docs[1:] == docs[:-1]
+            docs = np.concatenate([docs, docs[:-1][same_doc]])
+            keys = np.concatenate([codes, BIGRAM_FLAG | (codes[:-1][same_doc] << 31) | codes[1:][same_doc]])
+
+            # Number the chunk's features, giving keys not seen in earlier chunks the next free feature ids
+            local_keys, features = np.unique(keys, return_inverse=True)
+            positions = np.minimum(np.searchsorted(known_keys, local_keys), max(len(known_keys) - 1, 0))
+            seen = known_keys[positions] == local_keys if len(known_keys) else np.zeros(len(local_keys), dtype=bool)
+            ids = np.empty(len(local_keys), dtype=np.int64)
+            ids[seen] = known_ids[positions[seen]]
+            new_features = int(np.count_nonzero(~seen))
+            ids[~seen] = np.arange(self.n_features, self.n_features + new_features)
+            self.n_features += new_features
+            merged = np.concatenate([known_keys, local_keys[~seen]])
+            order = np.argsort(merged, kind='stable')
+            known_keys, known_ids = merged[order], np.concatenate([known_ids, ids[~seen]])[order]
+            features = ids[features.ravel()]
+
+            # Count each feature per description; triples come out sorted by description
+            if len(features):
+                order = np.lexsort((features, docs))
+                docs, features = docs[order], features[order]
+                starts = np.flatnonzero(np.concatenate([[True], (docs[1:] != docs[:-1]) | (features[1:] != features[:-1])]))
+                row_parts.append((docs[starts] + self.size).astype(np.int32))
+                col_parts.append(features[starts].astype(np.int32))
+                count_parts.append(np.diff(np.append(starts, len(features))).astype(np.int32))
+            self.size += len(chunk)
+
+        rows = np.concatenate(row_parts) if row_parts else np.empty(0, dtype=np.int32)
+        cols = np.concatenate(col_parts) if col_parts else np.empty(0, dtype=np.int32)
+        counts = np.concatenate(count_parts) if count_parts else np.empty(0, dtype=np.int32)
+        del row_parts, col_parts, count_parts
+
+        # Features found in a single description cannot link two titles, and very common ones only add noise
+        document_frequency = np.bincount(cols, minlength=self.n_features).astype(np.int32)
+        col_frequency = document_frequency[cols]
+        keep = (col_frequency >= 2) & (col_frequency <= max(2, max_document_frequency * self.size))
+        del col_frequency
+        rows, cols, counts = rows[keep], cols[keep], counts[keep]
+
+        # Sublinear TF-IDF weights, scaled so every description vector has unit length
+        idf = (np.log((1 + self.size) / (1 + document_frequency)) + 1).astype(np.float32)
+        weights = (1 + np.log(counts.astype(np.float32))) * idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=self.size)).astype(np.float32)
+        norms[norms == 0] = 1
+        weights /= norms[rows]
+
+        # Row-major copy to read a title's own vector, column-major copy to find every title sharing a feature
+        self.row_ptr = np.searchsorted(rows, np.arange(self.size + 1))
+        self.row_features = cols
+        self.row_weights = weights
+        order = np.argsort(cols, kind='stable')
+        self.col_ptr = np.searchsorted(cols[order], np.arange(self.n_features + 1))
+        self.col_rows = rows[order]
+        self.col_weights = weights[order]
+
+    # Read description vectors saved alongside a compiled catalog, or None when there are none
+    @classmethod
+    def load(cls, sidecar):
+        try:
+            with open(os.path.join(sidecar, 'similarity.json'), encoding='utf-8') as meta_file:
+                meta = json.load(meta_file)
+            index = cls()
+            index.size, index.n_features = meta['size'], meta['n_features']
+            for name in SIMILARITY_ARRAYS:
+                setattr(index, name, np.load(os.path.join(sidecar, f"similarity.{name}.npy"), mmap_mode='r'))
+            return index
+        except (OSError, ValueError, KeyError):
+            return None
+
+    # Save the vectors next to a compiled catalog; they are dropped along with the catalog when that is recompiled
+    def save(self, sidecar):
+        for name in SIMILARITY_ARRAYS:
+            np.save(os.path.join(sidecar, f"similarity.{name}.tmp.npy"), getattr(self, name))
+        for name in SIMILARITY_ARRAYS:
+            os.replace(os.path.join(sidecar, f"similarity.{name}.tmp.npy"), os.path.join(sidecar, f"similarity.{name}.npy"))
+
+        # The metadata goes last so partly written vectors are never picked up
+        with open(os.path.join(sidecar, 'similarity.tmp.json'), 'w', encoding='utf-8') as meta_file:
+            json.dump({'size': self.size, 'n_features': self.n_features}, meta_file)
+        os.replace(os.path.join(sidecar, 'similarity.tmp.json'), os.path.join(sidecar, 'similarity.json'))
+
+    # Return the rows most similar to a row and their cosine similarities, best first
+    def similar(self, row, k=5, max_query_terms=64):
+        features = self.row_features[self.row_ptr[row]:self.row_ptr[row + 1]]
+        weights = self.row_weights[self.row_ptr[row]:self.row_ptr[row + 1]]
+
+        # The heaviest features dominate the cosine, so only their posting lists are read
+        if len(features) > max_query_terms:
+            heaviest = np.argpartition(-weights, max_query_terms)[:max_query_terms]
+            features, weights = features[heaviest], weights[heaviest]
+
+        # Sparse matrix-vector product: gather the columns of the query features and add them up per row
+        starts, lengths = self.col_ptr[features], self.col_ptr[features + 1] - self.col_ptr[features]
+        positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+        scores = np.bincount(self.col_rows[positions], weights=self.col_weights[positions] * np.repeat(weights, lengths), minlength=self.size)
+        scores[row] = 0
+
+        # Keep only the top k with argpartition, then order that handful by score
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return candidates, scores[candidates]
+
+
+# Tokenized inverted index over titles, descriptions and disclaimers, ranked with BM25
+class SearchIndex:
+    @profiled
+    def __init__(self, documents=None, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        if documents is None:
+            return
+        self.size = len(documents)
+
+        # Tokenize every document at once, then code terms against a sorted vocabulary for prefix lookups
+        tokens = pd.Series(documents, dtype=object).fillna('').str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+        tokens = tokens[~tokens.isin(STOP_WORDS)]
+        token_docs = tokens.index.to_numpy(dtype=np.int64)
+        token_codes, vocabulary = pd.factorize(tokens.to_numpy())
+        order = np.argsort(np.asarray(vocabulary, dtype=str))
+        self.vocabulary = np.asarray(vocabulary, dtype=str)[order]
+        token_terms = np.argsort(order)[token_codes]
+
+        # Posting lists: documents and term frequencies grouped by term, documents ascending within each term
+        keys, counts = np.unique(token_terms * self.size + token_docs, return_counts=True)
+        terms, docs = keys // self.size, keys % self.size
+        self.term_ptr = np.searchsorted(terms, np.arange(len(self.vocabulary) + 1))
+        self.posting_docs = docs.astype(np.int32)
+        self.posting_freqs = counts.astype(np.float32)
+        self.doc_lengths = np.bincount(token_docs, minlength=self.size).astype(np.float32)
+
+    # Read a search index saved alongside a compiled catalog, or None when there is none
+    @classmethod
+    def load(cls, sidecar):
+        try:
+            with open(os.path.join(sidecar, 'search.json'), encoding='utf-8') as meta_file:
+                meta = json.load(meta_file)
+            index = cls(k1=meta['k1'], b=meta['b'])
+            index.size = meta['size']
+            with open(os.path.join(sidecar, 'search.vocabulary.txt'), encoding='utf-8') as vocabulary_file:
+                index.vocabulary = np.asarray(vocabulary_file.read().split('\n') if meta['terms'] else [], dtype=str)
+            for name in ('term_ptr', 'posting_docs', 'posting_freqs', 'doc_lengths'):
+                setattr(index, name, np.load(os.path.join(sidecar, f"search.{name}.npy"), mmap_mode='r'))
+            return index
+        except (OSError, ValueError, KeyError):
+            return None
+
+    # Save the index next to a compiled catalog; it is dropped along with the catalog when that is recompiled
+    def save(self, sidecar):
+        written = []
+        for name in ('term_ptr', 'posting_docs', 'posting_freqs', 'doc_lengths'):
+            np.save(os.path.join(sidecar, f"search.{name}.tmp.npy"), getattr(self, name))
+            written.append(f"search.{name}")
+        with open(os.path.join(sidecar, 'search.vocabulary.tmp.txt'), 'w', encoding='utf-8') as vocabulary_file:
+            vocabulary_file.write('\n'.join(self.vocabulary))
+        for name in written:
+            os.replace(os.path.join(sidecar, f"{name}.tmp.npy"), os.path.join(sidecar, f"{name}.npy"))
+        os.replace(os.path.join(sidecar, 'search.vocabulary.tmp.txt'), os.path.join(sidecar, 'search.vocabulary.txt'))
+
+        # The metadata goes last so a partly written index is never picked up
+        with open(os.path.join(sidecar, 'search.tmp.json'), 'w', encoding='utf-8') as meta_file:
+            json.dump({'size': self.size, 'terms': len(self.vocabulary), 'k1': self.k1, 'b': self.b}, meta_file)
+        os.replace(os.path.join(sidecar, 'search.tmp.json'), os.path.join(sidecar, 'search.json'))
+
+    # Return the vocabulary positions for a query term; a trailing '*' matches every term with that prefix
+    def term_ids(self, term):
+        if term.endswith('*'):
+            prefix = term.rstrip('*')
+            if not prefix:
+                return np.empty(0, dtype=np.int64)
+            start = np.searchsorted(self.vocabulary, prefix, side='left')
+            end = np.searchsorted(self.vocabulary, prefix + '\U0010ffff', side='left')
+            return np.arange(start, end)
+        position = np.searchsorted(self.vocabulary, term)
+        if position < len(self.vocabulary) and self.vocabulary[position] == term:
+            return np.array([position])
+        return np.empty(0, dtype=np.int64)
+
+    # Return the best matching rows for a keyword query and their BM25 scores, best first
+    def search(self, query, k=10):
+        terms = [match.group(0) + ('*' if match.group(1) else '') for match in re.finditer(r"[a-z0-9]+(\*?)", query.lower())]
+        term_ids = [self.term_ids(term) for term in terms if term.rstrip('*') not in STOP_WORDS]
+        term_ids = np.concatenate(term_ids) if term_ids else np.empty(0, dtype=np.int64)
+        if len(term_ids) == 0 or self.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # Gather the posting lists of every query term in one go
+        starts = self.term_ptr[term_ids]
+        lengths = self.term_ptr[term_ids + 1] - starts
+        positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+        docs = self.posting_docs[positions]
+        freqs = self.posting_freqs[positions]
+
+        # BM25: rarer terms weigh more, and term frequency saturates and is normalised by document length
+        idf = np.log(1 + (self.size - lengths + 0.5) / (lengths + 0.5))
+        average_length = max(float(self.doc_lengths.mean()), 1.0)
+        norms = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / average_length)
+        scores = np.bincount(docs, weights=np.repeat(idf, lengths) * freqs * (self.k1 + 1) / (freqs + norms), minlength=self.size)
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return candidates, scores[candidates]
+
+
+# Function to parse a genre expression such as "Action AND Comedy, NOT Horror" into a small query tree
+def parse_genre_query(expression):
+    # Operators and parentheses are tokens of their own; everything in between is a genre name
+    parts = re.split(r"(\(|\)|,|\bAND\b|\bOR\b|\bNOT\b)", expression, flags=re.IGNORECASE)
+    tokens = [part.strip() for part in parts if part.strip()]
+    tokens = ['AND' if token == ',' else token.upper() if token.upper() in ('AND', 'OR', 'NOT') else token for token in tokens]
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def advance():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    # OR binds loosest, then AND (also written as a comma), then NOT
+    def parse_or():
+        terms = [parse_and()]
+        while peek() == 'OR':
+            advance()
+            terms.append(parse_and())
+        return terms[0] if len(terms) == 1 else ('or', terms)
+
+    def parse_and():
+        terms = [parse_not()]
+        while peek() == 'AND':
+            advance()
+            terms.append(parse_not())
+        return terms[0] if len(terms) == 1 else ('and', terms)
+
+    def parse_not():
+        if peek() == 'NOT':
+            advance()
+            return ('not', parse_not())
+        if peek() == '(':
+            advance()
+            term = parse_or()
+            if peek() != ')':
+                raise ValueError("missing closing parenthesis")
+            advance()
+            return term
+        if peek() in (None, ')', 'AND', 'OR'):
+            raise ValueError(f"expected a genre but found {peek() or 'the end of the query'}")
+        return ('genre', advance())
+
+    tree = parse_or()
+    if peek() is not None:
+        raise ValueError(f"unexpected {peek()}")
+    return tree
+
+
+# Function to get the episode counts of some rows of a catalog (all rows by default), from its episode count column
+# or else from the descriptions
+def catalog_episode_counts(df, text, rows=None):
+    if EPISODE_COUNT_COLUMN in df.columns:
+        episode_counts = df[EPISODE_COUNT_COLUMN].to_numpy()
+        return (episode_counts if rows is None else episode_counts[rows]).astype(np.int32, copy=False)
+    rows = np.arange(len(df)) if rows is None else rows
+    if text is not None and 'description' in text.columns:
+        return extract_episode_counts(text.get(int(row), 'description') for row in rows)
+    if 'description' in df.columns:
+        return extract_episode_counts(df['description'].to_numpy(dtype=object)[rows])
+    return np.full(len(rows), -1, dtype=np.int32)
+
+
+# Function to key rows by episode count: the count plus one in the high 32 bits, so unknown counts (-1) sort first,
+# and the row in the low 32 bits, so sorted keys order rows by episode count and then by position
+def episode_count_keys(episode_counts, rows):
+    return ((np.asarray(episode_counts, dtype=np.int64) + 1) << 32) | np.asarray(rows, dtype=np.int64)
+
+
+# Function to split genre lists by commas, returning the genre ids of each list. Genres not seen before are added
+# to `genres` and `genre_ids` (keyed case-insensitively), so genres keep their order of first appearance.
+def split_genre_lists(combos, genres, genre_ids):
+    combo_genres = []
+    for combo in combos:
+        ids = []
+        for genre in str(combo).split(',') if not pd.isna(combo) else []:
+            genre = genre.strip()
+            if genre == '':
+                continue
+            if genre.lower() not in genre_ids:
+                genre_ids[genre.lower()] = len(genres)
+                genres.append(genre)
+            ids.append(genre_ids[genre.lower()])
+        combo_genres.append(ids)
+    return combo_genres
+
+
+# Title to row lookup kept as sorted 64-bit hashes of the titles next to their rows, a fraction of the size of a
+# dict of Python strings and ints. Titles are read back from the catalog's own array, so each is stored only once.
+class TitleLookup(collections.abc.Mapping):
+    def __init__(self, titles, rows=None):
+        self.titles = titles
+        rows = np.arange(len(titles)) if rows is None else np.asarray(rows)
+        hashes = pd.util.hash_array(np.asarray(titles, dtype=object)[rows], categorize=False)
+        # A stable sort keeps the rows of a duplicated title in catalog order, so its first row is found first
+        order = np.argsort(hashes, kind='stable')
+        self.hashes = hashes[order]
+        self.rows = rows[order].astype(np.int32 if len(titles) < 2**31 else np.int64)
+
+    # Return the first row holding the title, checking the title itself to rule out hash collisions
+    def __getitem__(self, title):
+        key = pd.util.hash_array(np.array([title], dtype=object), categorize=False)[0]
+        position = int(np.searchsorted(self.hashes, key))
+        while position < len(self.hashes) and self.hashes[position] == key:
+            row = int(self.rows[position])
+            if self.titles[row] == title:
+                return row
+            position += 1
+        raise KeyError(title)
+
+    def __iter__(self):
+        return iter(dict.fromkeys(self.titles[row] for row in np.sort(self.rows)))
+
+    def __len__(self):
+        return len(pd.unique(np.asarray(self.titles, dtype=object)[self.rows]))
+
+
+# Inverted genre index built once per catalog so filtering costs O(matches) instead of O(rows)
+class CatalogIndex:
+    @profiled
+    def __init__(self, df, text=None):
+        self.size = len(df)
+        self.text = text
+        # Cached results are keyed on this version, so results from an earlier load of the catalog are never reused
+        self.version = next(CATALOG_VERSIONS)
+
+        # Long text comes from the text store, or straight from the dataframe when there is none
+        self.titles = df['title'].to_numpy()
+        self.text_columns = {} if text is not None else {column: df[column] for column in TEXT_COLUMNS if column in df.columns}
+        self._similarity = None
+        self._similarity_lock = threading.Lock()
+        self._search = None
+        self._search_lock = threading.Lock()
+        # Positions fit in 32 bits for any realistic catalog, which halves the index footprint
+        self.row_dtype = np.int32 if self.size < 2**31 else np.int64
+
+        # Intern each distinct genre list once; rows only keep a small code pointing at their list.
+        # A categorical column already holds exactly that, so its codes are shared instead of copied.
+        if isinstance(df['genre'].dtype, pd.CategoricalDtype):
+            combo_codes, combos = df['genre'].array.codes, df['genre'].cat.categories.to_numpy()
+        else:
+            combo_codes, combos = pd.factorize(df['genre'].to_numpy())
+        self.combo_codes = combo_codes
+        self.combo_ids = {combo: code for code, combo in enumerate(combos)}
+        # Rows taken out by a reload keep their position, so row ids stay stable, but belong to no genre
+        self.removed_rows = np.empty(0, dtype=self.row_dtype)
+
+        # Episode ranges become small codes in the order of the menu (-1 for anything unknown)
+        self.episode_ranges = list(EPISODE_RANGE_FLAGS)
+        if isinstance(df['episode_range'].dtype, pd.CategoricalDtype) and list(df['episode_range'].cat.categories) == self.episode_ranges:
+            self.range_codes = df['episode_range'].array.codes
+        else:
+            self.range_codes = pd.Index(self.episode_ranges).get_indexer(df['episode_range'].to_numpy(dtype=object)).astype(np.int8)
+
+        # Titles count under the preset their episode count falls in, and under their episode range label only when
+        # the description gives no count; the codes stay shared with the dataframe when both agree everywhere
+        self.episode_counts = catalog_episode_counts(df, text)
+        preset_codes = preset_range_codes(self.episode_counts, self.range_codes)
+        if not np.array_equal(preset_codes, self.range_codes):
+            self.range_codes = preset_codes
+
+        # Rows ordered by episode count as one sorted key per row, so any range of counts is found by binary search
+        self.episode_keys = np.sort(episode_count_keys(self.episode_counts, np.arange(self.size)))
+
+        # Split every genre list by commas, keeping genres in order of first appearance for the menu
+        self.genres = []
+        self.genre_ids = {}
+        self.combo_genres = combo_genres = split_genre_lists(combos, self.genres, self.genre_ids)
+
+        # Membership matrix: which genres each distinct genre list contains
+        self.combo_membership = np.zeros((len(combos), len(self.genres)), dtype=bool)
+        for combo, ids in enumerate(combo_genres):
+            self.combo_membership[combo, ids] = True
+
+        # Facet cube: title counts per genre list and episode range, and the per-genre totals derived from it
+        counted = (combo_codes >= 0) & (self.range_codes >= 0)
+        cells = combo_codes[counted].astype(np.int64) * len(self.episode_ranges) + self.range_codes[counted]
+        self.combo_counts = np.bincount(cells, minlength=len(combos) * len(self.episode_ranges)).reshape(len(combos), len(self.episode_ranges))
+        self.facet_counts = self.combo_membership.T.astype(np.int64) @ self.combo_counts
+
+        # Hash index from title to row position; the handful of duplicated titles keep all their rows
+        titles = self.titles
+        self.title_rows = TitleLookup(titles)
+        duplicated = pd.Series(titles, dtype=object).duplicated(keep=False).to_numpy()
+        self.duplicate_title_rows = {}
+        for row in np.flatnonzero(duplicated).astype(self.row_dtype):
+            self.duplicate_title_rows.setdefault(titles[row], []).append(row)
+
+        # Map each genre (case-insensitively) to a sorted array of the row positions that carry it
+        order = np.argsort(combo_codes, kind='stable').astype(self.row_dtype)
+        bounds = np.searchsorted(combo_codes[order], np.arange(len(combos) + 1))
+        self.genre_rows = {}
+        for genre in self.genres:
+            member_combos = np.flatnonzero(self.combo_membership[:, self.genre_ids[genre.lower()]])
+            rows = np.concatenate([order[bounds[c]:bounds[c + 1]] for c in member_combos])
+            self.genre_rows[genre.lower()] = np.sort(rows)
+
+    # Pickle without the locks and the lazily built indexes, for worker processes that cannot fork
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('_similarity', '_similarity_lock', '_search', '_search_lock'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._similarity = self._search = None
+        self._similarity_lock = threading.Lock()
+        self._search_lock = threading.Lock()
+
+    # Return the sorted row positions for a genre, matching whole genre names only
+    def rows_for_genre(self, genre):
+        if not isinstance(genre, str):
+            return np.empty(0, dtype=self.row_dtype)
+        return self.genre_rows.get(genre.strip().lower(), np.empty(0, dtype=self.row_dtype))
+
+    # Return the sorted row positions of the titles with low to high episodes (no upper bound when high is None)
+    def episode_rows(self, low, high=None):
+        low = min(max(int(low), 0), 2**30)
+        high = 2**30 if high is None else min(max(int(high), -1), 2**30)
+        start, end = np.searchsorted(self.episode_keys, [(low + 1) << 32, (high + 2) << 32])
+        return np.sort((self.episode_keys[start:end] & 0xFFFFFFFF).astype(self.row_dtype))
+
+    # Return the sorted row positions for a genre, narrowed to an episode range preset or to a (low, high) number
+    # of episodes when one is given
+    def recommendation_rows(self, genre, episode_range):
+        rows = self.rows_for_genre(genre)
+        if isinstance(episode_range, tuple):
+            rows = np.intersect1d(rows, self.episode_rows(*episode_range), assume_unique=True)
+        elif episode_range in EPISODE_RANGE_FLAGS:
+            episode_range_code = self.episode_ranges.index(episode_range)
+            rows = rows[self.range_codes[rows] == episode_range_code]
+        return rows
+
+    # Return the sorted rows matching a parsed genre query, optionally narrowed to several episode range presets
+    # and (low, high) numbers of episodes
+    def query_rows(self, tree, episode_ranges=None):
+        rows = self.evaluate_genre_query(tree)
+        if episode_ranges:
+            episode_range_codes = [self.episode_ranges.index(label) for label in episode_ranges if label in self.episode_ranges]
+            matching = np.isin(self.range_codes[rows], episode_range_codes)
+            for low, high in (bounds for bounds in episode_ranges if isinstance(bounds, tuple)):
+                matching |= np.isin(rows, self.episode_rows(low, high), assume_unique=True)
+            rows = rows[matching]
+        return rows
+
+    # Evaluate a genre query tree as set algebra over the sorted row sets of the genre index
+    def evaluate_genre_query(self, tree):
+        kind, operand = tree
+        if kind == 'genre':
+            return self.rows_for_genre(operand)
+        if kind == 'not':
+            return np.setdiff1d(self.live_rows(), self.evaluate_genre_query(operand), assume_unique=True)
+        if kind == 'or':
+            return np.unique(np.concatenate([self.evaluate_genre_query(term) for term in operand]))
+
+        # AND: intersect the positive sets smallest first so the running result shrinks as fast as possible,
+        # then subtract the negated ones instead of materialising their complements
+        included = sorted((self.evaluate_genre_query(term) for term in operand if term[0] != 'not'), key=len)
+        excluded = [self.evaluate_genre_query(term[1]) for term in operand if term[0] == 'not']
+        rows = included[0] if included else self.live_rows()
+        for other in included[1:]:
+            if len(rows) == 0:
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        for other in excluded:
+            if len(rows) == 0:
+                break
+            rows = np.setdiff1d(rows, other, assume_unique=True)
+        return rows
+
+    # Return every row position that has not been removed by a reload
+    def live_rows(self):
+        rows = np.arange(self.size, dtype=self.row_dtype)
+        return np.setdiff1d(rows, self.removed_rows, assume_unique=True) if len(self.removed_rows) else rows
+
+    # Tell whether a row position holds a title of the catalog
+    def is_live(self, row):
+        position = np.searchsorted(self.removed_rows, row)
+        return 0 <= row < self.size and not (position < len(self.removed_rows) and self.removed_rows[position] == row)
+
+    # Return a new index for a catalog where some rows were replaced, appended or removed, sharing everything
+    # the change does not touch with this one, which stays valid for readers still using it. Returns None
+    # when the change needs a full rebuild: a genre left without titles, or a duplicated title involved.
+    def with_changes(self, df, text, updated, removed):
+        updated = np.unique(np.asarray(updated, dtype=self.row_dtype))
+        removed = np.unique(np.asarray(removed, dtype=self.row_dtype))
+        index = CatalogIndex.__new__(CatalogIndex)
+        index.__setstate__(self.__getstate__())
+        index.version = next(CATALOG_VERSIONS)
+        index.size = len(df)
+        index.text = text
+        index.text_columns = {} if text is not None else {column: df[column] for column in TEXT_COLUMNS if column in df.columns}
+
+        # Only the updated rows are read from the dataframe; converting whole columns would cost as much as a reload
+        updated_values = df[['title', 'genre', 'episode_range']].iloc[updated]
+        index.titles = np.empty(index.size, dtype=object)
+        index.titles[:self.size] = self.titles
+        index.titles[updated] = updated_values['title'].to_numpy(dtype=object)
+
+        # Per-row codes are copied (a few bytes per title) and extended over the appended rows
+        index.combo_codes = np.full(index.size, -1, dtype=np.int32)
+        index.combo_codes[:self.size] = self.combo_codes
+        index.range_codes = np.full(index.size, -1, dtype=self.range_codes.dtype)
+        index.range_codes[:self.size] = self.range_codes
+        index.combo_counts = self.combo_counts.copy()
+        touched = np.union1d(removed, updated[updated < self.size]).astype(self.row_dtype)
+
+        # Take the touched rows out of the facet cube and out of their genres
+        leaving, adding = collections.defaultdict(list), collections.defaultdict(list)
+        old_combos, old_ranges = index.combo_codes[touched], index.range_codes[touched]
+        counted = (old_combos >= 0) & (old_ranges >= 0)
+        np.subtract.at(index.combo_counts, (old_combos[counted], old_ranges[counted]), 1)
+        for combo in np.unique(old_combos[old_combos >= 0]):
+            for genre_id in self.combo_genres[combo]:
+                leaving[genre_id].append(touched[old_combos == combo])
+        index.combo_codes[removed] = -1
+        index.range_codes[removed] = -1
+
+        # Code the new values, interning genre lists and genres not seen before
+        index.genres, index.genre_ids = list(self.genres), dict(self.genre_ids)
+        index.combo_genres, index.combo_ids = list(self.combo_genres), dict(self.combo_ids)
+        for row, combo in zip(updated, updated_values['genre'].to_numpy(dtype=object)):
+            if combo not in index.combo_ids:
+                index.combo_ids[combo] = len(index.combo_genres)
+                index.combo_genres.extend(split_genre_lists([combo], index.genres, index.genre_ids))
+            index.combo_codes[row] = index.combo_ids[combo]
+        index.episode_counts = np.full(index.size, -1, dtype=np.int32)
+        index.episode_counts[:self.size] = self.episode_counts
+        index.episode_counts[removed] = -1
+        index.episode_counts[updated] = catalog_episode_counts(df, text, updated)
+        label_codes = pd.Index(self.episode_ranges).get_indexer(updated_values['episode_range'].to_numpy(dtype=object))
+        index.range_codes[updated] = preset_range_codes(index.episode_counts[updated], label_codes)
+
+        # Move the touched rows within the rows ordered by episode count, found by binary search like the genre rows
+        keys = np.delete(self.episode_keys, np.searchsorted(self.episode_keys, episode_count_keys(self.episode_counts[touched], touched)))
+        entering = np.sort(episode_count_keys(index.episode_counts[updated], updated))
+        index.episode_keys = np.insert(keys, np.searchsorted(keys, entering), entering)
+
+        # Grow the membership matrix and the facet cube for new genre lists and genres, then count the new values
+        index.combo_membership = np.zeros((len(index.combo_genres), len(index.genres)), dtype=bool)
+        index.combo_membership[:len(self.combo_genres), :len(self.genres)] = self.combo_membership
+        for combo in range(len(self.combo_genres), len(index.combo_genres)):
+            index.combo_membership[combo, index.combo_genres[combo]] = True
+        index.combo_counts = np.vstack([index.combo_counts, np.zeros((len(index.combo_genres) - len(self.combo_genres), len(self.episode_ranges)), dtype=index.combo_counts.dtype)])
+        new_combos, new_ranges = index.combo_codes[updated], index.range_codes[updated]
+        counted = (new_combos >= 0) & (new_ranges >= 0)
+        np.add.at(index.combo_counts, (new_combos[counted], new_ranges[counted]), 1)
+        index.facet_counts = index.combo_membership.T.astype(np.int64) @ index.combo_counts
+        for combo in np.unique(new_combos[new_combos >= 0]):
+            for genre_id in index.combo_genres[combo]:
+                adding[genre_id].append(updated[new_combos == combo])
+
+        # Only the row sets of the genres involved are rebuilt; the others are shared with this index
+        index.genre_rows = dict(self.genre_rows)
+        for genre_id in set(leaving) | set(adding):
+            key = index.genres[genre_id].lower()
+            rows = index.genre_rows.get(key, np.empty(0, dtype=self.row_dtype))
+            # A few rows come and go, so they are found by binary search instead of merging whole row sets
+            if genre_id in leaving:
+                rows = np.delete(rows, np.searchsorted(rows, np.concatenate(leaving[genre_id])))
+            if genre_id in adding:
+                entering = np.sort(np.concatenate(adding[genre_id]))
+                rows = np.insert(rows, np.searchsorted(rows, entering), entering)
+            index.genre_rows[key] = rows.astype(self.row_dtype, copy=False)
+        index.removed_rows = np.union1d(self.removed_rows, removed).astype(self.row_dtype)
+        if any(len(index.genre_rows.get(genre.lower(), ())) == 0 for genre in index.genres):
+            return None
+
+        # Titles go into a new layer over the old lookup table, which is flattened once the layers pile up
+        layer = {}
+        for row in touched:
+            title = self.titles[row]
+            if title in self.duplicate_title_rows:
+                return None
+            layer[title] = None
+        for row in updated:
+            title = index.titles[row]
+            if title in layer and layer[title] is not None or (title not in layer and self.title_rows.get(title) is not None):
+                return None
+            layer[title] = row
+        parents = self.title_rows.maps if isinstance(self.title_rows, collections.ChainMap) else [self.title_rows]
+        index.title_rows = collections.ChainMap(layer, *parents)
+        if len(index.title_rows.maps) > 8:
+            index.title_rows = TitleLookup(index.titles, index.live_rows())
+        return index
+
+    # Return the row position for a title, preferring the given row id when the title appears more than once
+    def resolve_title_row(self, title, row_id=None):
+        if title in self.duplicate_title_rows:
+            rows = self.duplicate_title_rows[title]
+            # Without a matching row id, duplicated titles always resolve to their first row in the catalog
+            return int(row_id) if row_id in rows else int(rows[0])
+        row = self.title_rows.get(title)
+        return None if row is None else int(row)
+
+    # Yield every row of a long text column, with None where it is missing, decoding one row at a time
+    def text_values(self, column):
+        if self.text is not None and column in self.text.columns:
+            values = (self.text.get(row, column) for row in range(self.size))
+        elif column in self.text_columns:
+            values = iter(self.text_columns[column])
+        else:
+            return itertools.repeat(None, self.size)
+        if len(self.removed_rows) == 0:
+            return values
+        removed = set(self.removed_rows.tolist())
+        return (None if row in removed else value for row, value in enumerate(values))
+
+    # Return the description similarity engine, loading it from the compiled catalog or building (and saving) it on first use
+    def similarity_index(self):
+        with self._similarity_lock:
+            if self._similarity is None:
+                sidecar = self.text.sidecar if self.text is not None else None
+                if sidecar is not None:
+                    self._similarity = SimilarityIndex.load(sidecar)
+                if self._similarity is None or self._similarity.size != self.size:
+                    self._similarity = SimilarityIndex(self.text_values('description'))
+                    if sidecar is not None:
+                        try:
+                            self._similarity.save(sidecar)
+                        except OSError:
+                            pass
+            return self._similarity
+
+    # Return the keyword search index, loading it from the compiled catalog or building (and saving) it on first use
+    def search_index(self):
+        with self._search_lock:
+            if self._search is None:
+                sidecar = self.text.sidecar if self.text is not None else None
+                if sidecar is not None:
+                    self._search = SearchIndex.load(sidecar)
+                if self._search is None or self._search.size != self.size:
+                    titles = self.titles.copy()
+                    titles[self.removed_rows] = None
+                    fields = [titles] + [self.text_values(column) for column in ('description', 'disclaimer')]
+                    self._search = SearchIndex([' '.join(str(value) for value in values if not pd.isna(value)) for values in zip(*fields)])
+                    if sidecar is not None:
+                        try:
+                            self._search.save(sidecar)
+                        except OSError:
+                            pass
+            return self._search
+
+    # Return the number of titles per episode range that carry every one of the given genres
+    def availability(self, genres):
+        if isinstance(genres, str):
+            genres = [genres]
+        genre_ids = [self.genre_ids.get(str(genre).strip().lower()) for genre in genres]
+        if not genre_ids or None in genre_ids:
+            return np.zeros(len(self.episode_ranges), dtype=np.int64)
+        if len(genre_ids) == 1:
+            return self.facet_counts[genre_ids[0]]
+        matching_combos = self.combo_membership[:, genre_ids].all(axis=1)
+        return self.combo_counts[matching_combos].sum(axis=0)
+
+
 # Function to get the user's preferred anime genre
-def get_genre(df):
-         # Split genres by commas, remove duplicates, and get unique genres
-        all_genres = df['genre'].str.split(', ').explode()
-        unique_genres = all_genres.unique()
+@profiled
+def get_genre(df, index=None):
+         # Use the prebuilt genre index when available, otherwise build one from the dataframe
+        if index is None:
+            index = CatalogIndex(df)
+        unique_genres = index.genres
 
         # Display available genres for the user
         print("[bold slate_blue1]1. Genre Preferences[/bold slate_blue1]")
@@ -143,7 +2088,7 @@ def get_genre(df):
         while True:
             print("\n[bold green1]\tEnter a number corresponding to your preferred genre: [/bold green1]", end="")
             try:
-                genre_choice = int(input())  # Get the user's choice as input
+                genre_choice = int(input(step='genre'))  # Get the user's choice as input
                 if 1 <= genre_choice <= len(unique_genres):
                     return unique_genres[genre_choice - 1]  # Return selected genre
                 else:
@@ -153,21 +2098,13 @@ def get_genre(df):
 
 
 # Function to get the preferred episode range for the chosen genre
-def get_episode_range(df, genre):
-    # Filter dataframe for the chosen genre
-    filtered_df = df[df['genre'].str.contains(genre, case=False, na=False)]  # case insensitive search
-
-    # Get unique episode ranges for the selected genre
-    filtered_genre_episode_range = filtered_df['episode_range'].unique()
-    unique_episode_range_list = df['episode_range'].unique()
-
-    # Define available episode ranges and their descriptions
-    episode_range_flags = {
-        "Short": "1 to 15 episodes",
-        "Medium": "16 to 30 episodes",
-        "Long": "31 to 100 episodes",
-        "Very Long": "101+ episodes"
-    }
+@profiled
+def get_episode_range(df, genre, index=None):
+    if index is None:
+        index = CatalogIndex(df)
+
+    # Read how many titles fall in each episode range for the genre straight from the facet cube
+    episode_range_counts = index.availability(genre)
 
     available_ranges = {}  # Dictionary to track which episode ranges are available for the chosen genre
 
@@ -176,74 +2113,164 @@ def get_episode_range(df, genre):
     print("[italic slate_blue1]\n\tHow long do you prefer the anime to be?[/italic slate_blue1]")
 
     # List the episode ranges with availability for the chosen genre
-    for i, (label, range_desc) in enumerate(episode_range_flags.items(), 1):
-        if label in filtered_genre_episode_range:
-            print(f"[italic slate_blue1]\t{i}. {label} ({range_desc})[/italic slate_blue1][sea_green3] \t-- Available[/sea_green3]")
+    for i, (label, range_desc) in enumerate(EPISODE_RANGE_FLAGS.items(), 1):
+        count = episode_range_counts[i - 1]
+        if count > 0:
+            titles = "title" if count == 1 else "titles"
+            print(f"[italic slate_blue1]\t{i}. {label} ({range_desc})[/italic slate_blue1][sea_green3] \t-- Available ({count} {titles})[/sea_green3]")
             available_ranges[i] = label
         else:
             print(f"[italic slate_blue1]\t{i}. {label} ({range_desc})[/italic slate_blue1][indian_red] \t-- Not available[/indian_red]")
+    print(f"[italic slate_blue1]\t   Or type a number of episodes above {len(EPISODE_RANGE_FLAGS)}, such as 12, or a range such as 10-40 or 100+[/italic slate_blue1]")
 
     # Loop until the user selects a valid episode range
     while True:
         try:
-            print("\n\t[bold green1]Enter a number corresponding to your preferred episode range: [/bold green1]", end="")
-            episode_choice = int(input())
+            print("\n\t[bold green1]Enter a number from the list, or the number of episodes you prefer: [/bold green1]", end="")
+            answer = input(step='episode range').strip()
 
-            if 1 <= episode_choice <= len(unique_episode_range_list):
+            # A number up to the length of the list picks a preset; anything else is read as a preset name or a number of episodes
+            if answer.isdigit() and int(answer) <= len(EPISODE_RANGE_FLAGS):
+                episode_choice = int(answer)
+            else:
+                episode_choice = parse_episode_range(answer)
+            if isinstance(episode_choice, str):
+                episode_choice = list(EPISODE_RANGE_FLAGS).index(episode_choice) + 1
+
+            if isinstance(episode_choice, tuple):
+                # Ranges are checked against the catalog once it has loaded; the menu summary only counts presets
+                if isinstance(index, CatalogIndex) and len(index.recommendation_rows(genre, episode_choice)) == 0:
+                    print(f"[bold indian_red]\tNo {genre} anime with {answer} episodes is currently available. Please choose another range.[/bold indian_red]")
+                else:
+                    return episode_choice
+            elif 1 <= episode_choice <= len(EPISODE_RANGE_FLAGS):
                 if episode_choice in available_ranges:
                     return available_ranges[episode_choice]  # Return the selected episode range
                 else:
                     print("[bold indian_red]\tPlease choose an episode range that is currently available.[/bold indian_red]")
             else:
                 print("[bold indian_red]\tError: Invalid input. Please enter a valid number from the list.[/bold indian_red]")
-        except:
+        except Exception:
             print("[bold indian_red]\tError: Invalid input. Please enter a valid number from the list.[/bold indian_red]")
 
 
 # Function to filter and get anime recommendations based on genre and episode range
-def get_anime_recommendations(df, genre, episode_range):
-    # Filter dataframe for the selected genre
-    filtered_df = df[df['genre'].str.contains(genre, case=False, na=False)]
-
-    # Filter by episode range
-    if episode_range == "Short":
-        filtered_df = filtered_df[filtered_df['episode_range'] == "Short"]
-    elif episode_range == "Medium":
-        filtered_df = filtered_df[filtered_df['episode_range'] == "Medium"]
-    elif episode_range == "Long":
-        filtered_df = filtered_df[filtered_df['episode_range'] == "Long"]
-    elif episode_range == "Very Long":
-        filtered_df = filtered_df[filtered_df['episode_range'] == "Very Long"]
-
-    # If recommendations are found, return the titles
-    if not filtered_df.empty:
-        recommendations = filtered_df[['title']]
+@profiled
+def get_anime_recommendations(df, genre, episode_range, index=None):
+    if index is None:
+        index = CatalogIndex(df)
+
+    # Look up the matching rows in the genre index instead of scanning the dataframe, reusing earlier answers
+    def lookup():
+        rows = index.recommendation_rows(genre, episode_range)
+        rows.flags.writeable = False
+        return rows
+
+    key = (index.version, 'rows', str(genre).strip().lower(), episode_range)
+    genre_rows = RESULT_CACHE.get_or_compute(key, lookup)
+    PROFILER.count('recommendations_matched', len(genre_rows))
+
+    # If recommendations are found, return the titles labelled with their stable row ids
+    if len(genre_rows) > 0:
+        recommendations = pd.DataFrame({'title': df['title'].to_numpy()[genre_rows]}, index=pd.Index(genre_rows, name='row_id'))
         return recommendations
     else:
         return None  # Return None if no recommendations found
 
 
 # Function to format the anime recommendations into a table for display
+@profiled
 def anime_recommendation_table(recommendations):
     if recommendations is not None and not recommendations.empty:
-        table_headers = ["No.", "Anime"]
-
-        # Prepare table data
-        table_data = [(i, anime) for i, anime in enumerate(recommendations['title'], start=1)]
-
-        # Return a formatted table of recommendations
-        return tabulate(table_data, headers=table_headers, tablefmt="fancy_grid", numalign="left", stralign="left")
+        key = (0, 'table', titles_digest(recommendations['title']))
+        return RESULT_CACHE.get_or_compute(key, lambda: format_recommendation_table(recommendations))
     else:
         return "[bold indian_red]No anime recommendations found for your preferences![/bold indian_red]"
 
 
-# Function to show the anime description based on user's choice
-def anime_description(df, recommendations):
+# Function to format every recommendation into one table
+def format_recommendation_table(recommendations):
+    from tabulate import tabulate
+
+    table_headers = ["No.", "Anime"]
+
+    # Prepare table data
+    table_data = [(i, anime) for i, anime in enumerate(recommendations['title'], start=1)]
+    PROFILER.count('table_rows_rendered', len(table_data))
+
+    # Return a formatted table of recommendations
+    return tabulate(table_data, headers=table_headers, tablefmt="fancy_grid", numalign="left", stralign="left")
+
+
+# Function to size the table columns from a bounded sample of titles, so every page lines up the same way
+def recommendation_column_widths(recommendations):
+    titles = recommendations['title'].to_numpy()
+    step = max(1, len(titles) // WIDTH_SAMPLE_SIZE)
+    sample = itertools.chain(titles[:WIDTH_SAMPLE_SIZE], titles[::step][:WIDTH_SAMPLE_SIZE])
+    title_width = min(MAX_TITLE_WIDTH, max((len(str(anime)) for anime in sample), default=0))
+    return len(str(len(titles))), title_width
+
+
+# Function to format one page of the recommendations, numbered by their position in the whole list
+@profiled
+def recommendation_table_page(recommendations, page, page_size=RECOMMENDATION_PAGE_SIZE, widths=None):
+    from tabulate import tabulate
+
+    number_width, title_width = widths if widths is not None else recommendation_column_widths(recommendations)
+    start = page * page_size
+    titles = recommendations['title'].iloc[start:start + page_size]
+
+    def render():
+        table_data = [(i, anime) for i, anime in enumerate(titles, start=start + 1)]
+        PROFILER.count('table_rows_rendered', len(table_data))
+
+        # Padded headers keep the columns the same width on every page; titles longer than the sample wrap
+        table_headers = ["No.".ljust(number_width), "Anime".ljust(title_width)]
+        return tabulate(table_data, headers=table_headers, tablefmt="fancy_grid", numalign="left", stralign="left", maxcolwidths=[None, max(title_width, 5)])
+
+    # Pages are cached by what they show, so going back to a page does not format it again
+    return RESULT_CACHE.get_or_compute((0, 'page', titles_digest(titles), start, number_width, title_width), render)
+
+
+# Function to yield the formatted recommendation pages one at a time
+def iter_recommendation_pages(recommendations, page_size=RECOMMENDATION_PAGE_SIZE):
+    widths = recommendation_column_widths(recommendations)
+    for page in range(math.ceil(len(recommendations) / page_size)):
+        yield recommendation_table_page(recommendations, page, page_size, widths)
+
+
+# Function to let the user browse the recommendations page by page
+@profiled
+def show_recommendation_pages(recommendations, page_size=RECOMMENDATION_PAGE_SIZE):
+    pages = math.ceil(len(recommendations) / page_size)
+    widths = recommendation_column_widths(recommendations)
+    page = 0
+    while True:
+        print(recommendation_table_page(recommendations, page, page_size, widths))
+        if pages <= 1:
+            return
+
+        first, last = page * page_size + 1, min((page + 1) * page_size, len(recommendations))
+        while True:
+            print(f"\n[bold green1]Showing {first}-{last} of {len(recommendations)}. Press Enter for the next page, 'P' for the previous page or 'Q' to stop browsing: [/bold green1]", end="")
+            choice = input(step='next page').strip().lower()
+            if choice in ('', 'p', 'q'):
+                break
+            print("[bold italic indian_red]Error: Invalid input, please press Enter or answer with 'P' or 'Q'.[/bold italic indian_red]")
+
+        # Browsing past the last page ends it, as does 'Q'
+        if choice == 'q' or (choice == '' and page == pages - 1):
+            return
+        page = max(0, page - 1) if choice == 'p' else page + 1
+
+
+# Function to get the zero-based position of the recommended anime the user wants to know more about
+def get_recommendation_choice(recommendations):
     while True:
         try:
             if len(recommendations) > 1:
                 print("[bold green1]\nPlease enter the number corresponding to the anime you want a description for: [/bold green1]", end="")
-                choice = input().strip()  # Get user input
+                choice = input(step='anime choice').strip()  # Get user input
             else:
                 choice = 1  # Automatically select the only anime if there is just one
 
@@ -252,34 +2279,115 @@ def anime_description(df, recommendations):
             if choice < 0 or choice >= len(recommendations):
                 print("[bold indian_red]Error: Invalid choice! Please enter a valid number from the list.[/bold indian_red]")
             else:
-                anime = recommendations.iloc[choice]['title']
-                anime_row = df[df['title'] == anime].iloc[0]
+                return choice
+
+        except ValueError:
+            print("[bold indian_red]Error: Invalid input! Please enter a valid number from the list.[/bold indian_red]")
 
-                # Display the anime's disclaimer and description
-                anime_disclaimer = anime_row['disclaimer']
-                anime_description = anime_row['description']
 
-                # Provide default text if the disclaimer or description is empty
-                if pd.isna(anime_disclaimer) or anime_disclaimer.strip() == "":
-                    anime_disclaimer = "[italic light_steel_blue]No specific disclaimer available.[/italic light_steel_blue]"
+# Function to get the catalog row of a recommended anime through the title index
+def recommendation_row(index, recommendations, choice):
+    # Use the row id carried by the recommendation if any, so duplicated titles resolve to the right row
+    row_id = recommendations.index[choice] if recommendations.index.name == 'row_id' else None
+    return index.resolve_title_row(recommendations.iloc[choice]['title'], row_id)
 
-                if pd.isna(anime_description) or anime_description.strip() == "":
-                    anime_description = "[italic light_steel_blue]No detailed description available.[/italic light_steel_blue]"
 
-                # Return the formatted description
-                return f"\n[bold italic light_steel_blue][underline]Anime:[/underline] [/bold italic light_steel_blue][italic light_steel_blue]{anime}[/italic light_steel_blue]\n\n[bold indian_red][underline]Disclaimer:[/underline] \n[/bold indian_red][italic indian_red]{anime_disclaimer}[/italic indian_red]\n[bold light_steel_blue]\n[underline]Synopsis:[/underline] \n[/bold light_steel_blue][italic light_steel_blue]{anime_description}[/italic light_steel_blue]"
+# Function to show the anime description based on user's choice
+@profiled
+def anime_description(df, recommendations, index=None, choice=None):
+    if index is None:
+        index = CatalogIndex(df)
 
-        except ValueError:
-            print("[bold indian_red]Error: Invalid input! Please enter a valid number from the list.[/bold indian_red]")
+    # Ask which anime to describe unless the caller already knows
+    if choice is None:
+        choice = get_recommendation_choice(recommendations)
+
+    anime = recommendations.iloc[choice]['title']
+    anime_row = recommendation_row(index, recommendations, choice)
+    if anime_row is None:
+        return format_anime_description(df, index, anime, anime_row)
+
+    # Anime described earlier in the session are served from the result cache
+    key = (index.version, 'description', anime_row, anime)
+    return RESULT_CACHE.get_or_compute(key, lambda: format_anime_description(df, index, anime, anime_row))
+
+
+# Function to format the disclaimer and description of one catalog row
+def format_anime_description(df, index, anime, anime_row):
+    # Display the anime's disclaimer and description, decoding them from the text store when the catalog has one
+    if anime_row is None:
+        anime_disclaimer = anime_description = None
+    elif index.text is not None:
+        anime_disclaimer = index.text.get(anime_row, 'disclaimer')
+        anime_description = index.text.get(anime_row, 'description')
+    else:
+        anime_disclaimer = df['disclaimer'].iloc[anime_row]
+        anime_description = df['description'].iloc[anime_row]
+
+    # Provide default text if the disclaimer or description is empty
+    if pd.isna(anime_disclaimer) or anime_disclaimer.strip() == "":
+        anime_disclaimer = "[italic light_steel_blue]No specific disclaimer available.[/italic light_steel_blue]"
+
+    if pd.isna(anime_description) or anime_description.strip() == "":
+        anime_description = "[italic light_steel_blue]No detailed description available.[/italic light_steel_blue]"
+
+    # Return the formatted description
+    return f"\n[bold italic light_steel_blue][underline]Anime:[/underline] [/bold italic light_steel_blue][italic light_steel_blue]{anime}[/italic light_steel_blue]\n\n[bold indian_red][underline]Disclaimer:[/underline] \n[/bold indian_red][italic indian_red]{anime_disclaimer}[/italic indian_red]\n[bold light_steel_blue]\n[underline]Synopsis:[/underline] \n[/bold light_steel_blue][italic light_steel_blue]{anime_description}[/italic light_steel_blue]"
+
+
+# Function to get the anime whose descriptions are most similar to a given catalog row
+@profiled
+def get_similar_anime(df, index, row, k=5):
+    similar_rows, _ = index.similarity_index().similar(row, k)
+    if len(similar_rows) == 0:
+        return None
+    return pd.DataFrame({'title': df['title'].to_numpy()[similar_rows]}, index=pd.Index(similar_rows, name='row_id'))
+
+
+# Function to get the anime matching a genre expression across one or more episode ranges
+@profiled
+def get_genre_query_recommendations(df, index, expression, episode_ranges=None):
+    rows = index.query_rows(parse_genre_query(expression), episode_ranges)
+    if len(rows) == 0:
+        return None
+    return pd.DataFrame({'title': df['title'].to_numpy()[rows]}, index=pd.Index(rows, name='row_id'))
+
+
+# Function to find anime by keywords in their titles, descriptions and disclaimers
+@profiled
+def search_anime(df, index, query, k=10):
+    rows, _ = index.search_index().search(query, k)
+    if len(rows) == 0:
+        return None
+    return pd.DataFrame({'title': df['title'].to_numpy()[rows]}, index=pd.Index(rows, name='row_id'))
+
+
+# Function to show a description and then offer anime with similar descriptions
+@profiled
+def show_anime_description(df, recommendations, index):
+    choice = get_recommendation_choice(recommendations)
+    print(anime_description(df, recommendations, index, choice))
+
+    anime_row = recommendation_row(index, recommendations, choice)
+    if anime_row is None:
+        return
+
+    question = f"\n[bold green1]Would you like to see anime similar to [gold1]{recommendations.iloc[choice]['title']}[/gold1]? (Enter 'Y' for Yes/'N' for No): [/bold green1]"
+    if get_choice(question, step='similar anime?'):
+        similar = get_similar_anime(df, index, anime_row)
+        if similar is not None:
+            print("[bold italic light_steel_blue]\nHere are the anime with the most similar stories:[/bold italic light_steel_blue]\n")
+        print(anime_recommendation_table(similar))
 
 
 # Function to get user's choice (yes or no) for certain actions
-def get_choice(question):
+@profiled
+def get_choice(question, step=None):
     while True:
         try:
             print(f"{question}", end="")
 
-            choice = input().strip().lower()  # Get user input
+            choice = input(step=step).strip().lower()  # Get user input
 
             if choice == 'y':
                 return True  # Yes choice
@@ -292,20 +2400,550 @@ def get_choice(question):
         except Exception as e:
             print("[bold italic indian_red]Error: Invalid input, please answer with 'Y' or 'N'.[/bold italic indian_red]")
 # Function to collect user feedback if they did not like the system
+@profiled
 def get_user_feedback():
     print("[bold italic orange1]\nWe're sorry to hear that![/bold italic orange1]😔[bold italic orange1] Could you please let us know how we can improve.[/bold italic orange1]")
     print("[bold orange1]\nYour thoughts: [/bold orange1]", end= "")
-    improvement_suggestion = input()
+    improvement_suggestion = input(step='feedback')
 
-    # Save the suggestion in a DataFrame for later use
-    feedback_data = pd.DataFrame({
-        'Timestamp': [pd.Timestamp.now()],
-        'Suggestion': [improvement_suggestion]
-    })
+    # Keep the suggestion as a plain record for the feedback writer
+    feedback_data = {
+        'Timestamp': datetime.datetime.now().isoformat(sep=' '),
+        'Suggestion': improvement_suggestion
+    }
 
     return feedback_data
 
 
+# Background writer that batches feedback records into a CSV file shared by many sessions
+class FeedbackWriter:
+    def __init__(self, path='user_feedback.csv', columns=('Timestamp', 'Suggestion'), flush_interval=0.5, fsync_interval=5.0, max_bytes=10 * 1024 * 1024, backups=5):
+        self.path = path
+        self.columns = list(columns)
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.last_error = None
+        self.records = queue.Queue()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name='feedback-writer', daemon=True)
+        self.thread.start()
+
+    # Queue one feedback record (a dict keyed by column) for the next batch
+    def submit(self, record):
+        if self.closed:
+            raise ValueError("feedback writer is closed")
+        self.records.put(record)
+
+    # Flush everything still queued, sync it to disk and stop the background thread
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.records.put(None)
+            self.thread.join()
+
+    # Collect records into batches and append each batch with a single write
+    def run(self):
+        last_fsync = time.monotonic()
+        unsynced = False
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                record = self.records.get(timeout=self.flush_interval)
+                # Take whatever else is already waiting so busy periods turn into fewer, larger writes
+                while True:
+                    if record is None:
+                        stopping = True
+                        break
+                    batch.append(record)
+                    record = self.records.get_nowait()
+            except queue.Empty:
+                pass
+
+            try:
+                if batch:
+                    self.append(batch)
+                    unsynced = True
+                if unsynced and (stopping or time.monotonic() - last_fsync >= self.fsync_interval):
+                    self.fsync()
+                    unsynced = False
+                    last_fsync = time.monotonic()
+            except OSError as e:
+                # Keep running so later feedback still gets a chance to be saved
+                self.last_error = e
+                sys.stderr.write(f"Error saving feedback: {e}\n")
+
+    # Format a batch as CSV lines and append it, rotating the file first if it would grow too large
+    def append(self, batch):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for record in batch:
+            writer.writerow([record.get(column, '') for column in self.columns])
+        data = buffer.getvalue().encode('utf-8')
+
+        with self.locked():
+            if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                self.rotate()
+            self.write_header()
+            # O_APPEND makes the single write land at the end even with other sessions appending concurrently
+            descriptor = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            try:
+                os.write(descriptor, data)
+            finally:
+                os.close(descriptor)
+
+    # Create the file with its header in one step, so no reader or other session ever sees it without one
+    def write_header(self):
+        if os.path.exists(self.path):
+            return
+        staging = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(staging, 'w', newline='', encoding='utf-8') as header_file:
+            csv.writer(header_file).writerow(self.columns)
+        try:
+            # Linking fails if another session created the file first, in which case its header wins
+            os.link(staging, self.path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(staging)
+
+    # Shift user_feedback.csv to user_feedback.csv.1, .1 to .2 and so on, dropping the oldest
+    def rotate(self):
+        for number in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{number}"):
+                os.replace(f"{self.path}.{number}", f"{self.path}.{number + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def fsync(self):
+        if os.path.exists(self.path):
+            descriptor = os.open(self.path, os.O_RDONLY)
+            try:
+                os.fsync(descriptor)
+            finally:
+                os.close(descriptor)
+
+    # Serialise rotation and appends across processes with an advisory lock on a sibling lock file
+    @contextlib.contextmanager
+    def locked(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# Feedback writers shared by every session in this process, one per file, created on first use
+_feedback_writers = {}
+_feedback_writer_lock = threading.Lock()
+
+
+# Function to get the shared feedback writer of a file, which is flushed and closed when the program exits
+def get_feedback_writer(path='user_feedback.csv'):
+    with _feedback_writer_lock:
+        if path not in _feedback_writers:
+            _feedback_writers[path] = FeedbackWriter(path)
+            atexit.register(_feedback_writers[path].close)
+        return _feedback_writers[path]
+
+
+# Catalog shared by batch workers; forked worker processes inherit it instead of receiving a copy
+_batch_catalog = None
+
+
+# Function to make the loaded catalog available to batch workers
+def set_batch_catalog(df, index):
+    global _batch_catalog
+    _batch_catalog = (df, index)
+
+
+# Function to describe the recommendations for a genre and episode range as plain data
+@profiled
+def recommendation_result(df, index, genre, episode_range):
+    # Numbers of episodes such as "10-40" are answered from the episode count index; other labels are matched as before
+    try:
+        selection = parse_episode_range(episode_range) if episode_range else episode_range
+    except ValueError:
+        selection = episode_range
+
+    # Share the row lookups cached by get_anime_recommendations, keyed the same way
+    def lookup():
+        rows = index.recommendation_rows(genre, selection)
+        rows.flags.writeable = False
+        return rows
+
+    rows = RESULT_CACHE.get_or_compute((index.version, 'rows', str(genre).strip().lower(), selection), lookup)
+    titles = df['title'].to_numpy()[rows]
+    return {
+        'genre': genre,
+        'episode_range': episode_range,
+        'count': len(rows),
+        'recommendations': [{'row_id': int(row), 'title': title} for row, title in zip(rows, titles)],
+    }
+
+
+# Function to answer one batch query line, returning the JSON line to write
+def answer_batch_query(line_number, line):
+    df, index = _batch_catalog
+    try:
+        # Queries are JSON objects, or plain "genre,episode_range" lines
+        if line.lstrip().startswith('{'):
+            query = json.loads(line)
+        else:
+            genre, _, episode_range = line.rstrip('\r\n').partition(',')
+            query = {'genre': genre.strip(), 'episode_range': episode_range.strip()}
+        genre, episode_range = query['genre'], query['episode_range']
+        if not isinstance(genre, str) or not isinstance(episode_range, str):
+            raise TypeError("genre and episode_range must be strings")
+    except (ValueError, KeyError, TypeError) as e:
+        return json.dumps({'line': line_number, 'error': f"invalid query: {e}"}) + '\n'
+
+    result = recommendation_result(df, index, genre, episode_range)
+    if 'id' in query:
+        result = {'id': query['id'], **result}
+    return json.dumps(result, ensure_ascii=False) + '\n'
+
+
+# Function to create the worker pool that answers batch queries against the shared catalog
+def make_batch_pool(workers, executor):
+    if executor == 'thread':
+        return futures.ThreadPoolExecutor(max_workers=workers)
+
+    # Forked workers share the loaded catalog copy-on-write; other platforms send it to each worker once
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+    return futures.ProcessPoolExecutor(max_workers=workers, initializer=set_batch_catalog, initargs=_batch_catalog)
+
+
+# Function to answer a stream of queries on a worker pool, writing JSON lines in input order
+@profiled
+def run_batch(df, index, queries, output, workers=1, executor='thread', max_buffer_bytes=64 * 1024 * 1024):
+    set_batch_catalog(df, index)
+    workers = max(1, workers)
+
+    # Track the size of finished results that are still waiting behind slower, earlier queries
+    buffered = {'bytes': 0}
+    lock = threading.Lock()
+
+    def count_result(future):
+        if not future.cancelled() and future.exception() is None:
+            with lock:
+                buffered['bytes'] += len(future.result())
+
+    def write_oldest():
+        result = pending.popleft().result()
+        output.write(result)
+        with lock:
+            buffered['bytes'] -= len(result)
+
+    # Keep a bounded window of queries in flight so neither the input nor the output is held in memory
+    max_pending = workers * 16
+    pending = collections.deque()
+    with make_batch_pool(workers, executor) as pool:
+        for line_number, line in enumerate(queries, start=1):
+            if not line.strip():
+                continue
+            future = pool.submit(answer_batch_query, line_number, line)
+            future.add_done_callback(count_result)
+            pending.append(future)
+
+            while pending and (pending[0].done() or len(pending) >= max_pending or buffered['bytes'] > max_buffer_bytes):
+                write_oldest()
+
+        while pending:
+            write_oldest()
+    output.flush()
+
+
+# Bounded record of recent request latencies per endpoint
+class LatencyRecorder:
+    def __init__(self, max_samples=10000):
+        self.samples = collections.defaultdict(lambda: collections.deque(maxlen=max_samples))
+        self.counts = collections.Counter()
+
+    def record(self, endpoint, seconds):
+        self.samples[endpoint].append(seconds)
+        self.counts[endpoint] += 1
+
+    # Summarise the recent latencies of every endpoint in milliseconds
+    def summary(self):
+        report = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            p50, p90, p99 = np.percentile(np.fromiter(samples, dtype=float), [50, 90, 99]) * 1000
+            report[endpoint] = {'requests': self.counts[endpoint], 'p50_ms': round(p50, 3), 'p90_ms': round(p90, 3), 'p99_ms': round(p99, 3)}
+        return report
+
+
+# Local HTTP service answering catalog queries from one in-process copy of the catalog
+class RecommendationService:
+    def __init__(self, df, index, workers=4, reloader=None):
+        self.df = df
+        self.index = index
+        # With a reloader, every request reads the catalog snapshot that is current when it arrives
+        self.reloader = reloader
+        # Filtering and text decoding run on worker threads so a slow query never stalls the event loop
+        self.executor = futures.ThreadPoolExecutor(max_workers=max(1, workers))
+        self.latencies = LatencyRecorder()
+
+    # Return the catalog and index to answer a request from
+    def snapshot(self):
+        return self.reloader.snapshot if self.reloader is not None else (self.df, self.index)
+
+    # Answer one request path, returning the HTTP status and a JSON-serialisable body
+    async def route(self, path, params):
+        loop = asyncio.get_running_loop()
+        df, index = self.snapshot()
+        if path == '/genres':
+            return 200, {'genres': index.genres}
+        if path == '/availability':
+            genres = params.get('genre', [])
+            counts = index.availability(genres)
+            return 200, {'genres': genres, 'availability': dict(zip(index.episode_ranges, counts.tolist()))}
+        if path == '/recommendations':
+            genre = params.get('genre', [''])[0]
+            episode_range = params.get('episode_range', [''])[0]
+            return 200, await loop.run_in_executor(self.executor, recommendation_result, df, index, genre, episode_range)
+        if path == '/description':
+            body = await loop.run_in_executor(self.executor, self.describe, df, index, params)
+            return (200, body) if body is not None else (404, {'error': 'anime not found'})
+        if path == '/search':
+            query = params.get('q', [''])[0]
+            return 200, await loop.run_in_executor(self.executor, self.search, df, index, query)
+        if path == '/stats':
+            stats = {'latency': self.latencies.summary(), 'cache': RESULT_CACHE.stats()}
+            if self.reloader is not None:
+                stats['catalog'] = self.reloader.stats()
+            return 200, stats
+        return 404, {'error': f"unknown endpoint {path}"}
+
+    # Rank anime by keyword relevance
+    def search(self, df, index, query):
+        rows, scores = index.search_index().search(query)
+        results = [{'row_id': int(row), 'title': df['title'].iloc[row], 'score': round(float(score), 4)} for row, score in zip(rows, scores)]
+        return {'query': query, 'results': results}
+
+    # Look up the description and disclaimer of an anime by row id or title
+    def describe(self, df, index, params):
+        if 'row_id' in params:
+            row = int(params['row_id'][0])
+            if not index.is_live(row):
+                return None
+        else:
+            row = index.resolve_title_row(params.get('title', [''])[0])
+            if row is None:
+                return None
+
+        # Decoded descriptions are cached per catalog version like the interactive ones
+        def decode():
+            result = {'row_id': row, 'title': df['title'].iloc[row]}
+            for column in TEXT_COLUMNS:
+                if index.text is not None:
+                    value = index.text.get(row, column)
+                else:
+                    value = df[column].iloc[row]
+                result[column] = None if pd.isna(value) else value
+            return result
+
+        return dict(RESULT_CACHE.get_or_compute((index.version, 'service-description', row), decode))
+
+    # Serve HTTP/1.1 requests on one connection until the client closes it
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                # Anything wrong with a request is answered with an error status instead of dropping the connection
+                started = None
+                try:
+                    request_line = await reader.readline()
+                    if not request_line:
+                        break
+                    started = time.perf_counter()
+                    headers = {}
+                    while True:
+                        header = await reader.readline()
+                        if header in (b'\r\n', b'\n', b''):
+                            break
+                        name, _, value = header.decode('latin-1').partition(':')
+                        headers[name.strip().lower()] = value.strip()
+
+                    method, target, version = request_line.decode('latin-1').split()
+                    url = urllib_parse.urlsplit(target)
+                    if method != 'GET':
+                        status, body = 405, {'error': 'only GET is supported'}
+                    else:
+                        status, body = await self.route(url.path, urllib_parse.parse_qs(url.query))
+                except ConnectionError:
+                    raise
+                except ValueError as e:
+                    status, body, url, version, headers = 400, {'error': f"bad request: {e}"}, None, 'HTTP/1.0', {}
+                except Exception as e:
+                    status, body, url, version, headers = 500, {'error': f"internal error: {e}"}, None, 'HTTP/1.0', {}
+                started = started or time.perf_counter()
+
+                payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}[status]
+                writer.write(
+                    f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(payload)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + payload
+                )
+                await writer.drain()
+                endpoint = url.path if url is not None and url.path in ('/genres', '/availability', '/recommendations', '/description', '/search', '/stats') else 'other'
+                self.latencies.record(endpoint, time.perf_counter() - started)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # Start listening; pass port 0 to let the OS pick a free port
+    async def start(self, host='127.0.0.1', port=8000):
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+# Function to run the recommendation service in the foreground until interrupted
+def serve(df, index, host='127.0.0.1', port=8000, workers=4, reloader=None):
+    service = RecommendationService(df, index, workers, reloader)
+
+    async def run():
+        server = await service.start(host, port)
+        address = server.sockets[0].getsockname()
+        print(f"[bold sea_green3]Serving anime recommendations on http://{address[0]}:{address[1]} (Ctrl+C to stop)[/bold sea_green3]")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.executor.shutdown()
+        # Report how the service performed before exiting
+        for endpoint, stats in service.latencies.summary().items():
+            print(f"[italic slate_blue1]{endpoint}: {stats['requests']} requests, p50 {stats['p50_ms']} ms, p90 {stats['p90_ms']} ms, p99 {stats['p99_ms']} ms[/italic slate_blue1]")
+
+
+# Raised when a scripted session asks for more answers than its script has. It is not an Exception, so the
+# menus' retry loops, which catch every Exception as bad input, cannot swallow it and ask again forever.
+class ScriptEnded(BaseException):
+    pass
+
+
+# Input and output of a session driven by a script instead of a terminal. Answers come from the script and output
+# is rendered into memory, styles included. The time from each answer to the next prompt, which is all the work
+# the program does in between, is recorded under the step that was answered.
+class ScriptedIO:
+    def __init__(self, answers, width=80, keep_output=False):
+        from rich.console import Console
+
+        self.answers = collections.deque(answers)
+        self.keep_output = keep_output
+        self.output = io.StringIO()
+        self.console = Console(file=self.output, width=width, force_terminal=True, color_system='truecolor')
+        self.steps = []
+        self.step = 'start'
+        self.answered = time.perf_counter()
+
+    def print(self, *objects, sep=' ', end='\n', file=None, flush=False):
+        self.console.print(*objects, sep=sep, end=end)
+        if not self.keep_output:
+            self.output.seek(0)
+            self.output.truncate()
+
+    def input(self, prompt='', step=None):
+        self.steps.append((self.step, time.perf_counter() - self.answered))
+        if prompt:
+            self.output.write(prompt)
+        self.step = step or 'input'
+        if not self.answers:
+            raise ScriptEnded(f"the script ended before the {self.step} step")
+        answer = self.answers.popleft()
+        self.answered = time.perf_counter()
+        return answer
+
+    # Record the time from the last answer to the end of the session
+    def finish(self):
+        self.steps.append((self.step, time.perf_counter() - self.answered))
+        self.step, self.answered = 'finished', time.perf_counter()
+
+    # Output of the session so far, when it is kept
+    def text(self):
+        return self.output.getvalue()
+
+
+# Function to read a session script: one answer per line, where an empty line presses Enter and lines starting
+# with '#' are comments
+def read_session_script(path):
+    with open(path, encoding='utf-8') as script:
+        return [line.rstrip('\r\n') for line in script if not line.startswith('#')]
+
+
+# Function to replay scripted sessions through the full menu loop against one loaded catalog, on a pool of threads,
+# returning the throughput, the latency of every step and the sessions that failed
+def replay_sessions(df, index, scripts, sessions=None, workers=4, feedback_path='replay_feedback.csv', width=80):
+    sessions = len(scripts) if sessions is None else sessions
+
+    def replay(number):
+        session_io = ScriptedIO(scripts[number % len(scripts)], width=width)
+        token = SESSION_IO.set(session_io)
+        error = None
+        try:
+            run_session(lambda wait=True: (df, index), feedback_path=feedback_path)
+            session_io.finish()
+            if session_io.answers:
+                error = f"{len(session_io.answers)} answers were left over at the end of the session"
+        except ScriptEnded as e:
+            error = str(e)
+        except Exception as e:
+            error = f"{type(e).__name__} in the {session_io.step} step: {e}"
+        finally:
+            SESSION_IO.reset(token)
+        return session_io.steps, error
+
+    started = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(replay, range(sessions)))
+    elapsed = time.perf_counter() - started
+
+    latencies = LatencyRecorder(max_samples=None)
+    errors = []
+    for number, (steps, error) in enumerate(results):
+        for step, seconds in steps:
+            latencies.record(step, seconds)
+        if error is not None:
+            errors.append({'session': number, 'script': number % len(scripts), 'error': error})
+    return {
+        'sessions': sessions,
+        'failed': len(errors),
+        'workers': max(1, workers),
+        'seconds': round(elapsed, 3),
+        'sessions_per_second': round(sessions / elapsed, 2) if elapsed > 0 else None,
+        'steps': {step: {'count': summary.pop('requests'), **summary} for step, summary in latencies.summary().items()},
+        'errors': errors,
+    }
+
+
+# Function to show the throughput and the per-step latencies of replayed sessions
+def show_replay_report(report):
+    from tabulate import tabulate
+
+    table = [(step, summary['count'], summary['p50_ms'], summary['p90_ms'], summary['p99_ms']) for step, summary in report['steps'].items()]
+    print(tabulate(table, headers=["Step", "Answers", "p50 ms", "p90 ms", "p99 ms"], tablefmt="simple"))
+    print(f"\n[bold sea_green3]{report['sessions']:,} sessions in {report['seconds']:.2f}s on {report['workers']} threads: {report['sessions_per_second']} sessions/s[/bold sea_green3]")
+    if report['failed']:
+        print(f"[bold indian_red]{report['failed']:,} sessions failed[/bold indian_red]")
+        for failure in report['errors'][:BAD_ROWS_PRINTED]:
+            print(f"  session {failure['session']} (script {failure['script']}): {failure['error']}")
+
+
 # Entry point for the program
 if __name__ == "__main__":
     main()
@@ -0,0 +1,53 @@
+import json
+from unittest.mock import patch
+
+import pandas as pd
+
+from bench_project import compare_results, generate_catalog, main, write_catalog
+from project import EPISODE_RANGE_FLAGS, REQUIRED_COLUMNS, read_catalog_csv
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 1: synthetic catalog generator
+# ******************************************************************************************************************************************************
+
+# Test that the generator is seeded and produces a catalog the program can read
+def test_generate_catalog(tmp_path):
+    catalog = generate_catalog(500, seed=7)
+    assert catalog.equals(generate_catalog(500, seed=7))
+    assert not catalog.equals(generate_catalog(500, seed=8))
+    assert set(REQUIRED_COLUMNS) <= set(catalog.columns)
+    assert set(catalog['episode_range']) <= set(EPISODE_RANGE_FLAGS)
+    assert catalog['genre'].str.split(', ').str.len().between(1, 4).all()
+
+    # Writing chunk by chunk produces the same catalog as generating it in memory
+    with patch('bench_project.GENERATOR_CHUNK_ROWS', 50):
+        path = write_catalog(tmp_path / "anime_data.csv", 120, seed=7)
+        expected = generate_catalog(120, seed=7)
+    pd.testing.assert_frame_equal(read_catalog_csv(path), expected, check_dtype=False)
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 2: benchmark results
+# ******************************************************************************************************************************************************
+
+# Test that a short benchmark run writes JSON results and that the comparison flags slowdowns
+def test_benchmark_results(tmp_path, capsys):
+    output = tmp_path / "bench.json"
+    assert main(["--rows", "200", "--repeat", "1", "--output", str(output), "--workdir", str(tmp_path)]) == 0
+    report = json.loads(output.read_text())
+    names = {result['name'] for result in report['results']}
+    assert {'load.read_csv', 'get_genre', 'get_episode_range', 'get_anime_recommendations', 'anime_recommendation_table.page', 'anime_description'} <= names
+    assert {'get_anime_recommendations.cached', 'anime_recommendation_table.page.cached', 'anime_description.cached'} <= names
+
+    slower = {'results': [{**result, 'median_s': result['median_s'] * 2} for result in report['results']]}
+    comparison, regressed = compare_results(report, slower, threshold=0.5)
+    assert regressed and all(row['regressed'] for row in comparison)
+    assert all(row['ratio'] == 2 for row in comparison if row['baseline_s'] > 0)
+    unchanged, regressed = compare_results(report, report)
+    assert regressed is False
+    assert all(row['ratio'] == 1 and not row['regressed'] for row in unchanged if row['baseline_s'] > 0)
+
+    (tmp_path / "slower.json").write_text(json.dumps(slower))
+    assert main(["--compare", str(output), str(tmp_path / "slower.json")]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
@@ -1,7 +1,20 @@
+import argparse
+import asyncio
+import codecs
+import csv
+import io
+import json
+import os
+import pickle
+import subprocess
+import sys
+import threading
 from datetime import datetime
+import numpy as np
 import pandas as pd
+import pytest
 from unittest.mock import patch
-from project import get_genre, get_episode_range, get_anime_recommendations, anime_recommendation_table, anime_description, get_user_feedback
+from project import extract_episode_count, parse_episode_range, ScriptedIO, SESSION_IO, ScriptEnded, run_session, replay_sessions, read_session_script, show_replay_report, detect_catalog_encoding, load_anime_catalog, EPISODE_RANGE_FLAGS, CatalogReloader, TitleLookup, compact_catalog, catalog_memory_report, show_memory_report, RESULT_CACHE, ResultCache, PROFILER, write_profile_report, CatalogIndex, iter_recommendation_pages, show_recommendation_pages, read_catalog_summary, FeedbackWriter, parse_genre_query, get_genre_query_recommendations, RecommendationService, SearchIndex, SimilarityIndex, get_similar_anime, run_batch, compile_catalog, open_catalog, read_fresh_manifest, get_genre, get_episode_range, get_anime_recommendations, anime_recommendation_table, anime_description, get_user_feedback
 
 #Define a helper function that will create a sample DataFrame
 def mock_df():
@@ -222,3 +235,902 @@ def test_anime_description_invalid_choice():
     expected_output = "\n[bold italic light_steel_blue][underline]Anime:[/underline] [/bold italic light_steel_blue][italic light_steel_blue]Naruto[/italic light_steel_blue]\n\n[bold indian_red][underline]Disclaimer:[/underline] \n[/bold indian_red][italic indian_red]Naruto disclaimer[/italic indian_red]\n[bold light_steel_blue]\n[underline]Synopsis:[/underline] \n[/bold light_steel_blue][italic light_steel_blue]Naruto description[/italic light_steel_blue]"
     # Assert if the function's output matches the expected output
     assert result == expected_output
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 6: CatalogIndex
+# ******************************************************************************************************************************************************
+
+# Test case for the genre index built from the comma-separated genre lists
+def test_catalog_index_genre_rows():
+    # Create a mock DataFrame
+    df = mock_df()
+    index = CatalogIndex(df)
+
+    # Assert that genres keep the order in which they first appear
+    assert index.genres == ['Action', 'Adventure', 'Fantasy', 'Comedy', 'Drama', 'Romance']
+
+    # Assert that each genre maps to the sorted row positions carrying it, case-insensitively
+    assert list(index.rows_for_genre('Action')) == [0, 1]
+    assert list(index.rows_for_genre('drama')) == [2, 3]
+
+# Test case for genres that only share a substring with another genre
+def test_catalog_index_whole_genre_match():
+    # Create a DataFrame where one genre name is contained in another
+    df = pd.DataFrame({
+        'title': ['Clannad', 'Toradora!'],
+        'genre': ['Drama', 'Romance, Romantic Comedy'],
+        'episode_range': ['Long', 'Medium'],
+        'description': ['Clannad description', 'Toradora! description'],
+        'disclaimer': ['Clannad disclaimer', 'Toradora! disclaimer']
+    })
+
+    # Assert that 'Romance' does not pick up rows through a substring match
+    recommendations = get_anime_recommendations(df, 'Romance', 'Medium')
+    assert list(recommendations['title']) == ['Toradora!']
+    assert get_anime_recommendations(df, 'Roman', 'Medium') is None
+
+# Test case for the genre x episode range facet cube
+def test_catalog_index_availability():
+    # Create a mock DataFrame
+    df = mock_df()
+    index = CatalogIndex(df)
+
+    # Assert that counts follow the Short, Medium, Long, Very Long menu order
+    assert list(index.availability('Action')) == [0, 0, 1, 1]
+    assert list(index.availability('Drama')) == [1, 1, 0, 0]
+
+    # Assert that combined genres only count titles carrying all of them
+    assert list(index.availability(['Action', 'Comedy'])) == [0, 0, 1, 0]
+    assert list(index.availability(['Action', 'Horror'])) == [0, 0, 0, 0]
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 7: compiled catalog
+# ******************************************************************************************************************************************************
+
+# Test case for loading a catalog back from its compiled sidecar
+def test_compile_catalog_round_trip(tmp_path):
+    # Write the mock DataFrame as a catalog CSV file and compile it
+    path = str(tmp_path / 'anime_data.csv')
+    mock_df().to_csv(path, index=False, encoding='ISO-8859-1')
+    compile_catalog(path)
+
+    # Assert that the sidecar is fresh and loads the same data as the CSV file
+    assert read_fresh_manifest(path) is not None
+    df, text = open_catalog(path)
+    expected = pd.read_csv(path, encoding='ISO-8859-1')
+    assert df.drop(columns=['episode_count']).astype(str).equals(expected.drop(columns=['description', 'disclaimer']))
+    assert [str(df[column].dtype) for column in df.columns] == ['str', 'category', 'category', 'int32']
+    assert list(df['episode_count']) == [-1, -1, -1, -1]
+    assert list(df['episode_range'].cat.categories) == ['Short', 'Medium', 'Long', 'Very Long']
+    assert [text.get(row, 'description') for row in range(len(df))] == list(expected['description'])
+
+    # Assert that touching the CSV file keeps the sidecar fresh and records the new mtime
+    os.utime(path, ns=(0, 10**18))
+    assert read_fresh_manifest(path) is not None
+    assert read_fresh_manifest(path)['source']['mtime_ns'] == 10**18
+
+# Test case for a sidecar that no longer matches its CSV file
+def test_compile_catalog_stale(tmp_path):
+    # Compile the mock catalog, then add a title to the CSV file
+    path = str(tmp_path / 'anime_data.csv')
+    mock_df().to_csv(path, index=False, encoding='ISO-8859-1')
+    compile_catalog(path)
+    df = pd.concat([mock_df(), mock_df().iloc[[0]].assign(title='Boruto')], ignore_index=True)
+    df.to_csv(path, index=False, encoding='ISO-8859-1')
+
+    # Assert that the stale sidecar is ignored and recompiled from the CSV file
+    assert read_fresh_manifest(path) is None
+    assert list(open_catalog(path)[0]['title']) == list(df['title'])
+    assert read_fresh_manifest(path)['rows'] == len(df)
+
+# Test case for opening a catalog with the long text columns kept on disk
+def test_open_catalog_text_store(tmp_path):
+    # Write the mock DataFrame as a catalog CSV file and open it
+    path = str(tmp_path / 'anime_data.csv')
+    mock_df().to_csv(path, index=False, encoding='ISO-8859-1')
+    df, text = open_catalog(path)
+
+    # Assert that only the short columns are resident and the sidecar was compiled on first open
+    assert list(df.columns) == ['title', 'genre', 'episode_range', 'episode_count']
+    assert text.columns == ['description', 'disclaimer']
+    assert read_fresh_manifest(path) is not None
+
+    # Assert that descriptions are decoded from the text store for the chosen anime
+    recommendations = pd.DataFrame({'title': ['Naruto', 'Spy x Family']})
+    with patch('builtins.input', return_value='2'):
+        result = anime_description(df, recommendations, CatalogIndex(df, text))
+    assert 'Spy x Family description' in result
+    assert 'Spy x Family disclaimer' in result
+
+# Test case for descriptions of titles that appear more than once in the catalog
+def test_anime_description_duplicate_titles():
+    # Create a DataFrame where 'Naruto' is listed twice with different descriptions
+    df = pd.concat([mock_df(), mock_df().iloc[[0]].assign(description='Naruto remake description')], ignore_index=True)
+    index = CatalogIndex(df)
+
+    # Assert that the title index resolves the carried row id, and the first row without one
+    assert index.resolve_title_row('Naruto', 4) == 4
+    assert index.resolve_title_row('Naruto') == 0
+    assert index.resolve_title_row('Boruto') is None
+
+    # Assert that recommendations carry row ids that pick the matching description
+    recommendations = get_anime_recommendations(df, 'Fantasy', 'Very Long', index)
+    assert list(recommendations.index) == [0, 4]
+    with patch('builtins.input', return_value='2'):
+        result = anime_description(df, recommendations, index)
+    assert 'Naruto remake description' in result
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 8: run_batch
+# ******************************************************************************************************************************************************
+
+# Test case for answering a stream of queries with a worker pool
+def test_run_batch_keeps_input_order():
+    # Create a mock DataFrame and a stream of JSON and plain queries
+    df = mock_df()
+    queries = io.StringIO('{"id": 1, "genre": "Action", "episode_range": "Long"}\nDrama,Short\n\nnot json {"\n' * 20)
+    output = io.StringIO()
+
+    run_batch(df, CatalogIndex(df), queries, output, workers=4, max_buffer_bytes=64)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+
+    # Assert that every query is answered in input order, skipping blank lines
+    assert len(results) == 60
+    assert results[0] == {'id': 1, 'genre': 'Action', 'episode_range': 'Long', 'count': 1, 'recommendations': [{'row_id': 1, 'title': 'Spy x Family'}]}
+    assert results[1]['recommendations'] == [{'row_id': 3, 'title': 'Violet Evergarden'}]
+    assert results[2]['count'] == 0
+    assert results[3]['id'] == 1
+
+# Test case for malformed queries, and for sending the catalog to worker processes that cannot fork
+def test_run_batch_bad_queries_and_pickled_catalog(tmp_path):
+    df = mock_df()
+    queries = io.StringIO('{"genre": "Action", "episode_range": [1]}\n{"genre": "Action"}\n{"genre": "Action", "episode_range": "Long"}\n')
+    output = io.StringIO()
+
+    run_batch(df, CatalogIndex(df), queries, output)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+
+    # Assert that bad lines are reported by line number without stopping the rest of the batch
+    assert [result.get('line') for result in results] == [1, 2, None]
+    assert results[2]['count'] == 1
+
+    # Assert that a catalog with memory-mapped text survives pickling, locks and all
+    path = str(tmp_path / 'anime_data.csv')
+    mock_df().to_csv(path, index=False, encoding='ISO-8859-1')
+    catalog_df, text = open_catalog(path)
+    index = pickle.loads(pickle.dumps(CatalogIndex(catalog_df, text)))
+    assert index.text.get(1, 'description') == 'Spy x Family description'
+    assert list(index.recommendation_rows('Action', 'Long')) == [1]
+    assert index.search_index().size == 4
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 9: RecommendationService
+# ******************************************************************************************************************************************************
+
+# Test case for querying the local HTTP recommendation service
+def test_recommendation_service_endpoints():
+    # Create a mock DataFrame and a service for it
+    df = mock_df()
+    service = RecommendationService(df, CatalogIndex(df), workers=2)
+
+    async def get(port, target):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(body)
+
+    async def exercise():
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return [
+                await get(port, '/genres'),
+                await get(port, '/availability?genre=Action&genre=Comedy'),
+                await get(port, '/recommendations?genre=Drama&episode_range=Short'),
+                await get(port, '/description?title=Naruto'),
+                await get(port, '/description?row_id=9'),
+                await get(port, '/recommendations?genre=Drama&episode_range=Short'),
+                await get(port, '/description?title=Naruto'),
+                await get(port, '/stats'),
+            ]
+
+    RESULT_CACHE.clear()
+    before = RESULT_CACHE.stats()
+    genres, availability, recommendations, description, missing, repeated, described, stats = asyncio.run(exercise())
+    service.executor.shutdown()
+
+    # Assert that every endpoint answers from the shared catalog
+    assert genres == (200, {'genres': ['Action', 'Adventure', 'Fantasy', 'Comedy', 'Drama', 'Romance']})
+    assert availability[1]['availability'] == {'Short': 0, 'Medium': 0, 'Long': 1, 'Very Long': 0}
+    assert recommendations[1]['recommendations'] == [{'row_id': 3, 'title': 'Violet Evergarden'}]
+    assert description[1]['description'] == 'Naruto description'
+    assert missing[0] == 404
+
+    # Assert that latencies were recorded for the earlier requests
+    assert stats[1]['latency']['/genres']['requests'] == 1
+
+    # Assert that repeated requests are answered from the result cache
+    assert repeated == recommendations and described == description
+    assert stats[1]['cache']['hits'] - before['hits'] == 2
+
+# Test case for requests the service cannot answer normally
+def test_recommendation_service_errors():
+    df = mock_df()
+    service = RecommendationService(df, CatalogIndex(df), workers=1)
+
+    async def send(port, request):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(request)
+        response = await reader.read()
+        writer.close()
+        return int(response.split()[1])
+
+    async def exercise():
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            # A request line over the stream limit, then a search that fails inside the worker
+            too_long = await send(port, b"GET /genres?" + b"x" * 100_000 + b" HTTP/1.1\r\n\r\n")
+            with patch.object(service, 'search', side_effect=RuntimeError('worker failed')):
+                failed = await send(port, b"GET /search?q=ninja HTTP/1.1\r\nConnection: close\r\n\r\n")
+            return too_long, failed
+
+    too_long, failed = asyncio.run(exercise())
+    service.executor.shutdown()
+
+    # Assert that both got an error response and were timed under 'other'
+    assert (too_long, failed) == (400, 500)
+    assert service.latencies.summary()['other']['requests'] == 2
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 10: SimilarityIndex
+# ******************************************************************************************************************************************************
+
+# Test case for finding the titles whose descriptions are most alike
+def test_similarity_index_ranks_shared_words():
+    documents = [
+        'A ninja village boy trains to become the strongest ninja',
+        'A young ninja trains hard in the hidden village',
+        'A pianist rediscovers music after losing his mother',
+        'A retired soldier writes letters for clients',
+        'A boy learns magic to become the wizard king',
+    ]
+    similarity = SimilarityIndex(documents)
+
+    # Assert that the ninja stories rank each other first, and the row itself is never returned
+    rows, scores = similarity.similar(0, k=2)
+    assert list(rows) == [1, 4]
+    assert scores[0] > scores[1] > 0
+
+    # Assert that a description sharing nothing with the others has no similar titles
+    rows, scores = similarity.similar(3, k=2)
+    assert len(rows) == 0
+
+# Test case for the similar anime offered after a description
+def test_get_similar_anime():
+    df = mock_df()
+    df['description'] = ['A ninja story', 'A spy story with a ninja', 'A music story', 'A letters tale']
+
+    similar = get_similar_anime(df, CatalogIndex(df), 0, k=1)
+    assert list(similar['title']) == ['Spy x Family']
+
+# Test case for description vectors stored in the compiled catalog and built in chunks
+def test_similarity_index_saved_in_catalog(tmp_path):
+    path = str(tmp_path / 'anime_data.csv')
+    df = mock_df()
+    df['description'] = ['A ninja story', 'A spy story with a ninja', 'A music story', 'A letters tale']
+    df.to_csv(path, index=False, encoding='ISO-8859-1')
+
+    # Build the vectors through one catalog index, then open the catalog again
+    catalog_df, text = open_catalog(path)
+    built = CatalogIndex(catalog_df, text).similarity_index()
+    with patch('project.SIMILARITY_CHUNK_ROWS', 1):
+        chunked = SimilarityIndex(df['description'])
+    loaded = CatalogIndex(*open_catalog(path)).similarity_index()
+
+    # Assert that the second index maps the saved vectors, and that chunked tokenizing gives the same ranking
+    assert isinstance(loaded.col_rows, np.memmap)
+    assert [list(index.similar(0, k=1)[0]) for index in (built, chunked, loaded)] == [[1], [1], [1]]
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 11: SearchIndex
+# ******************************************************************************************************************************************************
+
+# Test case for ranking documents by keyword with BM25
+def test_search_index_ranking_and_prefixes(tmp_path):
+    documents = [
+        'Naruto. A ninja from the hidden leaf village',
+        'Spy x Family. A spy, an assassin and a telepath',
+        'Your Lie in April. A pianist and a violinist',
+        'Naruto Shippuden. The ninja returns to the village after training with a ninja master',
+    ]
+    index = SearchIndex(documents)
+
+    # Assert that documents mentioning the keyword more often rank first, and unknown words match nothing
+    rows, scores = index.search('ninja')
+    assert list(rows) == [3, 0]
+    assert scores[0] > scores[1]
+    assert len(index.search('mecha')[0]) == 0
+
+    # Assert that a trailing '*' matches every word with that prefix
+    assert list(index.search('violin*')[0]) == [2]
+    assert set(index.search('pian* spy')[0]) == {1, 2}
+
+    # Assert that a saved index loads back with the same results
+    index.save(str(tmp_path))
+    loaded = SearchIndex.load(str(tmp_path))
+    assert list(loaded.search('ninja')[0]) == [3, 0]
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 12: genre queries
+# ******************************************************************************************************************************************************
+
+# Test case for parsing genre expressions
+def test_parse_genre_query():
+    # Assert that commas mean AND, NOT binds tightest and OR loosest
+    assert parse_genre_query('Action AND Comedy, NOT Horror') == ('and', [('genre', 'Action'), ('genre', 'Comedy'), ('not', ('genre', 'Horror'))])
+    assert parse_genre_query('drama or (Action and not Sci-Fi)') == ('or', [('genre', 'drama'), ('and', [('genre', 'Action'), ('not', ('genre', 'Sci-Fi'))])])
+
+    # Assert that incomplete expressions are rejected
+    for expression in ['Action AND', '(Drama', 'NOT', 'Drama Comedy)']:
+        try:
+            parse_genre_query(expression)
+        except ValueError:
+            pass
+        else:
+            assert False, expression
+
+# Test case for evaluating genre expressions over the genre index
+def test_get_genre_query_recommendations():
+    # Create a mock DataFrame
+    df = mock_df()
+    index = CatalogIndex(df)
+
+    # Assert that AND, OR and NOT combine the genre row sets
+    assert list(get_genre_query_recommendations(df, index, 'Action AND NOT Fantasy')['title']) == ['Spy x Family']
+    assert list(get_genre_query_recommendations(df, index, 'Comedy OR Romance')['title']) == ['Spy x Family', 'Your Lie in April']
+    assert list(get_genre_query_recommendations(df, index, 'NOT Action, NOT Romance')['title']) == ['Violet Evergarden']
+
+    # Assert that results can be narrowed to several episode ranges
+    assert list(get_genre_query_recommendations(df, index, 'Drama OR Action', ['Short', 'Very Long'])['title']) == ['Naruto', 'Violet Evergarden']
+    assert get_genre_query_recommendations(df, index, 'Action AND Drama') is None
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 13: FeedbackWriter
+# ******************************************************************************************************************************************************
+
+# Test case for feedback submitted from several sessions at once
+def test_feedback_writer_batches_records(tmp_path):
+    path = str(tmp_path / 'user_feedback.csv')
+    writer = FeedbackWriter(path, flush_interval=0.01)
+
+    # Submit feedback from several threads, including text that needs CSV quoting
+    def submit(session):
+        for i in range(50):
+            writer.submit({'Timestamp': f"2024-01-01 00:00:{i:02d}", 'Suggestion': f"session {session}, idea {i}\nmore"})
+
+    sessions = [threading.Thread(target=submit, args=(session,)) for session in range(4)]
+    for session in sessions:
+        session.start()
+    for session in sessions:
+        session.join()
+    writer.close()
+
+    # Assert that the file has one header and every record, intact
+    with open(path, newline='', encoding='utf-8') as feedback_file:
+        rows = list(csv.reader(feedback_file))
+    assert rows[0] == ['Timestamp', 'Suggestion']
+    assert len(rows) == 201
+    assert sorted(rows[1:])[0] == ['2024-01-01 00:00:00', 'session 0, idea 0\nmore']
+
+# Test case for rotating the feedback file once it grows too large
+def test_feedback_writer_rotation(tmp_path):
+    path = str(tmp_path / 'user_feedback.csv')
+    writer = FeedbackWriter(path, max_bytes=60, backups=2)
+
+    # Append three batches directly, each too large to share a file with the previous one
+    for i in range(3):
+        writer.append([{'Timestamp': f"2024-01-01 00:00:0{i}", 'Suggestion': 'x' * 30}])
+    writer.close()
+
+    # Assert that every rotated file starts with its own header
+    for name in (path, f"{path}.1", f"{path}.2"):
+        with open(name, newline='', encoding='utf-8') as feedback_file:
+            assert next(csv.reader(feedback_file)) == ['Timestamp', 'Suggestion']
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 14: startup time
+# ******************************************************************************************************************************************************
+
+# Time allowed for importing project.py; pandas alone takes several times longer than this to import
+STARTUP_BUDGET_SECONDS = 0.25
+
+# Helper that runs a snippet in a fresh interpreter and returns what it prints as JSON
+def run_fresh(code, cwd='.'):
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-c', f"import sys; sys.path.insert(0, {project_dir!r})\n{code}"], cwd=cwd, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+# Test case for importing the program without any heavy modules
+def test_startup_import_budget():
+    report = run_fresh(
+        "import json, time\n"
+        "started = time.perf_counter()\n"
+        "import project\n"
+        "elapsed = time.perf_counter() - started\n"
+        "heavy = [name for name in ('numpy', 'pandas', 'rich', 'tabulate', 'asyncio') if name in sys.modules]\n"
+        "print(json.dumps({'elapsed': elapsed, 'heavy': heavy}))"
+    )
+
+    # Assert that no heavy module is imported up front and the import stays within budget
+    assert report['heavy'] == []
+    assert report['elapsed'] < STARTUP_BUDGET_SECONDS
+
+# Test case for showing the menus from a compiled catalog without pandas
+def test_menus_without_pandas(tmp_path):
+    # Compile the mock catalog, whose summary the menus are shown from
+    path = str(tmp_path / 'anime_data.csv')
+    mock_df().to_csv(path, index=False, encoding='ISO-8859-1')
+    compile_catalog(path)
+    assert read_catalog_summary(path).availability('Action') == [0, 0, 1, 1]
+
+    report = run_fresh(
+        "import json\n"
+        "from unittest.mock import patch\n"
+        "import project\n"
+        f"summary = project.read_catalog_summary({path!r})\n"
+        "with patch('builtins.input', side_effect=['1', '4']):\n"
+        "    genre = project.get_genre(None, summary)\n"
+        "    episode_range = project.get_episode_range(None, genre, summary)\n"
+        "heavy = [name for name in ('numpy', 'pandas') if name in sys.modules]\n"
+        "print('\\n' + json.dumps({'choice': [genre, episode_range], 'heavy': heavy}))",
+        cwd=str(tmp_path)
+    )
+
+    # Assert that the user could pick a genre and story length before numpy or pandas was loaded
+    assert report['choice'] == ['Action', 'Very Long']
+    assert report['heavy'] == []
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 15: paginated recommendation tables
+# ******************************************************************************************************************************************************
+
+# Test case for formatting large recommendation lists one page at a time
+def test_iter_recommendation_pages():
+    recommendations = pd.DataFrame({'title': [f"Anime {i}" for i in range(1, 46)]})
+    pages = list(iter_recommendation_pages(recommendations, page_size=20))
+
+    # Assert that pages hold the right slice, numbered across the whole list
+    assert len(pages) == 3
+    assert 'Anime 20' in pages[0] and 'Anime 21' not in pages[0]
+    assert '│ 21 ' in pages[1] and '│ 45 ' in pages[2]
+
+    # Assert that every page has the same column widths
+    assert len({page.splitlines()[0] for page in pages}) == 1
+
+# Test case for browsing pages before picking an anime by its global number
+def test_show_recommendation_pages_navigation():
+    recommendations = pd.DataFrame({'title': [f"Anime {i}" for i in range(1, 46)]})
+
+    # Simulate moving forward, back, forward twice past an invalid answer, then leaving at the last page
+    printed = []
+    with patch('builtins.input', side_effect=['', 'p', 'x', '', '', '']), patch('project.print', side_effect=lambda *args, **kwargs: printed.append(str(args[0]) if args else '')):
+        show_recommendation_pages(recommendations, page_size=20)
+
+    # Assert that pages 1, 2, 1, 2 and 3 were shown, judging by the number of their first row
+    tables = [text for text in printed if text.startswith('╒')]
+    assert [table.splitlines()[3].split('│')[1].strip() for table in tables] == ['1', '21', '1', '21', '41']
+
+    # Assert that the description lookup picks anime by their number in the whole list
+    with patch('builtins.input', return_value='45'):
+        result = anime_description(mock_df(), recommendations)
+    assert 'Anime 45' in result
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 16: stage profiling
+# ******************************************************************************************************************************************************
+
+# Test case for the stage timers staying silent until profiling is turned on
+def test_profiler_disabled_records_nothing():
+    PROFILER.reset()
+    with patch('builtins.input', return_value='1'):
+        get_genre(mock_df())
+
+    # Assert that nothing was timed or counted
+    assert PROFILER.snapshot() == {'stages': {}, 'counters': {}}
+
+# Test case for timing and counting the stages of one menu round
+def test_profiler_records_stages(tmp_path):
+    PROFILER.reset()
+    PROFILER.enable()
+    try:
+        with patch('builtins.input', side_effect=['1', '3']):
+            df = mock_df()
+            genre = get_genre(df)
+            episode_range = get_episode_range(df, genre)
+        anime_recommendation_table(get_anime_recommendations(df, genre, episode_range))
+    finally:
+        PROFILER.enable(False)
+
+    # Assert that every stage was timed and the matches were counted
+    report = PROFILER.snapshot()
+    assert {'get_genre', 'get_episode_range', 'get_anime_recommendations', 'anime_recommendation_table', 'print', 'input'} <= set(report['stages'])
+    assert report['stages']['input']['calls'] == 2
+    assert report['counters']['recommendations_matched'] == 1
+
+    # Assert that input waits nest under the menus in the folded stacks and that the summary lists the stages
+    assert 'get_genre;input ' in PROFILER.folded()
+    stream = io.StringIO()
+    write_profile_report(folded=tmp_path / "stages.folded", stream=stream)
+    assert 'get_anime_recommendations' in stream.getvalue()
+    assert (tmp_path / "stages.folded").read_text() == PROFILER.folded()
+    PROFILER.reset()
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 17: result cache
+# ******************************************************************************************************************************************************
+
+# Test case for repeated queries being answered from the cache until the catalog is reloaded
+def test_result_cache_reuses_and_invalidates():
+    df = mock_df()
+    index = CatalogIndex(df)
+    RESULT_CACHE.clear()
+    before = RESULT_CACHE.stats()
+
+    # Ask for the same recommendations, table and description twice
+    for _ in range(2):
+        recommendations = get_anime_recommendations(df, 'Action', 'Long', index)
+        table = anime_recommendation_table(recommendations)
+        description = anime_description(df, recommendations, index, choice=0)
+    stats = RESULT_CACHE.stats()
+
+    # Assert that the second round was served from the cache with identical output
+    assert stats['hits'] - before['hits'] == 3
+    assert stats['misses'] - before['misses'] == 3
+    assert 'Spy x Family' in table and 'Spy x Family description' in description
+
+    # Assert that a reloaded catalog drops the rows and descriptions of the old one but keeps content-keyed tables
+    reloaded = CatalogIndex(df)
+    get_anime_recommendations(df, 'Action', 'Long', reloaded)
+    assert RESULT_CACHE.stats()['misses'] - stats['misses'] == 1
+    assert all(key[0] in (0, reloaded.version) for key in RESULT_CACHE.entries)
+
+# Test case for the cache staying within its entry and byte bounds under concurrent use
+def test_result_cache_bounds_and_threads():
+    cache = ResultCache(max_entries=8, max_bytes=10_000)
+    cache.put((0, 'big'), 'x' * 20_000)
+    assert cache.stats()['entries'] == 0
+
+    def worker(offset):
+        for i in range(200):
+            key = (0, 'value', (i + offset) % 16)
+            assert cache.get_or_compute(key, lambda: f"value {key[2]}" + ' ' * 1000) == f"value {key[2]}" + ' ' * 1000
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Assert that every lookup was counted and the bounds were never exceeded
+    stats = cache.stats()
+    assert stats['hits'] + stats['misses'] == 800
+    assert stats['entries'] <= 8 and stats['bytes'] <= 10_000
+    assert stats['evictions'] > 0
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 18: catalog hot reload
+# ******************************************************************************************************************************************************
+
+# Helper function to rewrite the catalog file with a newer modification time
+def rewrite_catalog(df, path, seconds):
+    df.to_csv(path, index=False, encoding='ISO-8859-1')
+    os.utime(path, ns=(0, seconds * 10**9))
+
+# Test case for edits to the catalog file being applied row by row to a new snapshot
+def test_catalog_reloader_applies_deltas(tmp_path):
+    path = tmp_path / "anime_data.csv"
+    rewrite_catalog(mock_df(), path, 1)
+    df, text = open_catalog(path)
+    index = CatalogIndex(df, text)
+    # The mock catalog is tiny, so allow any share of it to change without a full reload
+    reloader = CatalogReloader(path, df, index, max_delta_fraction=1.0)
+
+    # Assert that the first look at an unchanged file only records it
+    assert reloader.check() is None and reloader.snapshot == (df, index)
+
+    # Change one title, remove another and add a new one
+    edited = mock_df()
+    edited.loc[0, ['episode_range', 'description']] = ['Long', 'Naruto new description']
+    new_row = pd.DataFrame([{'title': 'Frieren', 'genre': 'Fantasy, Mystery', 'episode_range': 'Medium', 'description': 'Frieren description', 'disclaimer': 'Frieren disclaimer'}])
+    edited = pd.concat([edited.drop(index=3), new_row], ignore_index=True)
+    rewrite_catalog(edited, path, 2)
+    change = reloader.check()
+    new_df, new_index = reloader.snapshot
+
+    # Assert that only the deltas were applied and that the new snapshot answers like a freshly built index
+    assert (change['added'], change['changed'], change['removed'], change['full']) == (1, 1, 1, False)
+    rebuilt = CatalogIndex(edited)
+    for genre in rebuilt.genres:
+        assert list(new_index.availability(genre)) == list(rebuilt.availability(genre))
+        for episode_range in EPISODE_RANGE_FLAGS:
+            assert sorted(new_df['title'].iloc[new_index.recommendation_rows(genre, episode_range)]) == sorted(edited['title'].iloc[rebuilt.recommendation_rows(genre, episode_range)])
+    assert new_index.genres == ['Action', 'Adventure', 'Fantasy', 'Comedy', 'Drama', 'Romance', 'Mystery']
+    assert new_index.resolve_title_row('Violet Evergarden') is None
+    assert new_index.text.get(new_index.resolve_title_row('Naruto'), 'description') == 'Naruto new description'
+    assert new_index.text.get(new_index.resolve_title_row('Frieren'), 'disclaimer') == 'Frieren disclaimer'
+    assert list(get_anime_recommendations(new_df, 'Action', 'Long', new_index)['title']) == ['Naruto', 'Spy x Family']
+    assert [str(dtype) for dtype in new_df.dtypes] == [str(dtype) for dtype in df.dtypes]
+
+    # Assert that readers of the old snapshot still see the catalog as it was
+    assert list(get_anime_recommendations(df, 'Action', 'Long', index)['title']) == ['Spy x Family']
+    assert index.text.get(0, 'description') == 'Naruto description'
+    assert index.resolve_title_row('Violet Evergarden') == 3
+
+    # Assert that an untouched file is not read again
+    assert reloader.check() is None and reloader.snapshot[1] is new_index
+
+# Test case for changes too large to apply row by row falling back to a full reload
+def test_catalog_reloader_full_reload(tmp_path):
+    path = tmp_path / "anime_data.csv"
+    rewrite_catalog(mock_df(), path, 1)
+    df, text = open_catalog(path)
+    reloader = CatalogReloader(path, df, CatalogIndex(df, text))
+    reloader.check()
+
+    replaced = mock_df()
+    replaced['title'] = replaced['title'] + ' (remake)'
+    rewrite_catalog(replaced, path, 2)
+    assert reloader.check()['full'] is True
+    assert reloader.snapshot[1].resolve_title_row('Naruto (remake)') == 0
+    assert reloader.stats()['reloads'] == 1 and reloader.stats()['titles'] == 4
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 19: compact catalog and memory report
+# ******************************************************************************************************************************************************
+
+# Test case for genres and episode ranges loaded as codes that the index filters on without copying
+def test_compact_catalog_shares_codes(tmp_path):
+    path = tmp_path / "anime_data.csv"
+    mock_df().to_csv(path, index=False, encoding='ISO-8859-1')
+    df, text = open_catalog(path)
+    index = CatalogIndex(df, text)
+
+    # Assert that the codes are shared and the answers match an index built from plain strings
+    assert np.shares_memory(index.combo_codes, df['genre'].array.codes)
+    assert np.shares_memory(index.range_codes, df['episode_range'].array.codes)
+    plain = CatalogIndex(mock_df())
+    assert index.genres == plain.genres
+    assert list(index.recommendation_rows('Drama', 'Short')) == list(plain.recommendation_rows('Drama', 'Short')) == [3]
+    assert list(index.availability('Action')) == list(plain.availability('Action'))
+
+    # Assert that unknown episode ranges are kept as values but match no preset
+    odd = mock_df()
+    odd.loc[0, 'episode_range'] = 'Unknown'
+    odd_index = CatalogIndex(compact_catalog(odd))
+    assert list(compact_catalog(odd)['episode_range'].cat.categories) == ['Short', 'Medium', 'Long', 'Very Long', 'Unknown']
+    assert odd_index.range_codes[0] == -1 and odd_index.availability('Action').sum() == 1
+
+# Test case for the title lookup resolving duplicated and missing titles like a dict
+def test_title_lookup():
+    titles = np.array(['Naruto', 'Bleach', 'Naruto', 'Monster'], dtype=object)
+    lookup = TitleLookup(titles)
+    assert lookup['Naruto'] == 0 and lookup['Monster'] == 3
+    assert lookup.get('One Piece') is None and 'Bleach' in lookup
+    assert list(lookup) == ['Naruto', 'Bleach', 'Monster'] and len(lookup) == 3
+    assert TitleLookup(titles, rows=[1, 2, 3])['Naruto'] == 2
+
+# Test case for the memory report counting every column and index structure
+def test_memory_report(tmp_path, capsys):
+    path = tmp_path / "anime_data.csv"
+    pd.concat([mock_df()] * 50, ignore_index=True).to_csv(path, index=False, encoding='ISO-8859-1')
+    df, text = open_catalog(path)
+    index = CatalogIndex(df, text)
+    rows = {name: (stored_as, size, plain) for name, stored_as, size, plain in catalog_memory_report(df, index)}
+
+    # Assert that text columns are mapped rather than resident and the codes are not counted twice
+    assert set(rows) == {'title', 'genre', 'episode_range', 'episode_count', 'description', 'disclaimer', 'index: title lookup', 'index: genre row sets', 'index: row codes', 'index: episode count order', 'index: facet cube'}
+    assert rows['description'][1] == 0 and rows['description'][2] > 0
+    assert rows['genre'][1] < rows['genre'][2] and rows['episode_range'][1] < rows['episode_range'][2]
+    assert rows['index: row codes'] == ('shared with the dataframe', 0, None)
+
+    show_memory_report(df, index)
+    assert "200 titles take" in capsys.readouterr().out
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 20: streaming catalog ingestion
+# ******************************************************************************************************************************************************
+
+# Test case for bad rows being skipped and reported with their line numbers while the rest of the file loads
+def test_compile_catalog_skips_bad_rows(tmp_path, capsys):
+    path = tmp_path / "anime_data.csv"
+    path.write_text(
+        'title,genre,episode_range,description,disclaimer\n'
+        'Naruto,"Action, Adventure",Very Long,"A ninja.\n\nIn total, there are 220 episodes.",None\n'
+        'Broken,Action,Short,too,many,fields\n'
+        ',Drama,Short,No title,None\n'
+        'Monster,"Drama, Mystery",Long,A doctor.,\n'
+        'Bleach,Action,Very Long,"A reaper.",Violence\n',
+        encoding='utf-8'
+    )
+    compile_catalog(str(path), chunk_rows=2)
+    manifest = read_fresh_manifest(str(path))
+
+    # Assert that the bad rows were counted, kept with their line numbers and reported on stderr
+    assert manifest['rows'] == 3
+    assert manifest['bad_rows'] == {'count': 2, 'first': [{'line': 5, 'error': 'expected 5 fields, saw 6'}, {'line': 6, 'error': 'missing title'}]}
+    assert "line 5: expected 5 fields, saw 6" in capsys.readouterr().err
+
+    # Assert that the good rows, multi-line fields and empty fields came through, and the summary matches an index
+    df, text = open_catalog(str(path))
+    assert list(df['title']) == ['Naruto', 'Monster', 'Bleach']
+    assert text.get(0, 'description') == "A ninja.\n\nIn total, there are 220 episodes."
+    assert text.get(1, 'disclaimer') is None
+    summary = read_catalog_summary(str(path))
+    index = CatalogIndex(df, text)
+    assert summary.genres == index.genres == ['Action', 'Adventure', 'Drama', 'Mystery']
+    assert [summary.availability(genre) for genre in index.genres] == [list(index.availability(genre)) for genre in index.genres]
+
+# Test case for the encoding of the catalog being detected and its text stored as UTF-8
+def test_detect_catalog_encoding(tmp_path):
+    row = 'title,genre,episode_range,description,disclaimer\nPokémon,Adventure,Very Long,Gotta catch ’em all – again,None\n'
+    for name, encoding, data in [
+        ('utf8.csv', 'utf-8', row.encode('utf-8')),
+        ('bom.csv', 'utf-8-sig', codecs.BOM_UTF8 + row.encode('utf-8')),
+        ('windows.csv', 'cp1252', row.encode('cp1252')),
+        ('latin.csv', 'ISO-8859-1', row.replace('’', "'").replace('–', '-').encode('ISO-8859-1') + b'Odd\x81,Drama,Short,x,y\n'),
+    ]:
+        path = tmp_path / name
+        path.write_bytes(data)
+        assert detect_catalog_encoding(path) == encoding
+        df, text = open_catalog(str(path))
+        assert df['title'][0] == 'Pokémon' and df.columns[0] == 'title'
+    assert text.get(1, 'disclaimer') == 'y'
+    assert open_catalog(str(tmp_path / 'windows.csv'))[1].get(0, 'description') == 'Gotta catch ’em all – again'
+
+# Test case for missing columns being reported from the header before any row is read
+def test_missing_columns_checked_first(tmp_path, capsys):
+    path = tmp_path / "anime_data.csv"
+    path.write_text('title,genre,episode_range\n"unterminated,Action,Short\n', encoding='utf-8')
+    with patch('project.iter_catalog_chunks', side_effect=AssertionError("rows were read")):
+        df, text = open_catalog(str(path))
+    assert list(df.columns) == ['title', 'genre', 'episode_range'] and len(df) == 0
+    assert load_anime_catalog(argparse.Namespace(catalog=str(path), compile=False)) is None
+    assert "Missing required columns: description, disclaimer" in capsys.readouterr().out
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 21: headless sessions
+# ******************************************************************************************************************************************************
+
+# Test case for a whole session driven by a script, without a terminal
+def test_run_session_scripted(tmp_path):
+    df = mock_df()
+    index = CatalogIndex(df)
+    session_io = ScriptedIO(['1', '4', 'y', 'n', 'n', 'n', 'More seasons please'], keep_output=True)
+    token = SESSION_IO.set(session_io)
+    try:
+        run_session(lambda wait=True: (df, index), feedback_path=str(tmp_path / "feedback.csv"))
+        session_io.finish()
+    finally:
+        SESSION_IO.reset(token)
+
+    # Assert that every answer was used, each step was timed and the output was rendered into the session
+    assert not session_io.answers
+    assert [step for step, _ in session_io.steps] == ['start', 'genre', 'episode range', 'description?', 'similar anime?', 'main menu?', 'enjoyed?', 'feedback']
+    assert "Naruto description" in session_io.text() and "Happy watching!" in session_io.text()
+
+    # Assert that a script running out of answers ends the session, even inside the yes/no retry loop
+    token = SESSION_IO.set(ScriptedIO(['1', '4']))
+    try:
+        with pytest.raises(ScriptEnded, match="description"):
+            run_session(lambda wait=True: (df, index))
+    finally:
+        SESSION_IO.reset(token)
+
+# Test case for replaying many scripted sessions at once against one catalog
+def test_replay_sessions(tmp_path, capsys):
+    df = mock_df()
+    index = CatalogIndex(df)
+    script = tmp_path / "session.txt"
+    script.write_text("# Action, Very Long, no description\n1\n4\nn\nn\ny\n", encoding='utf-8')
+    scripts = [read_session_script(script), ['1', '4']]
+    assert scripts[0] == ['1', '4', 'n', 'n', 'y']
+
+    report = replay_sessions(df, index, scripts, sessions=20, workers=4, feedback_path=str(tmp_path / "feedback.csv"))
+
+    # Assert that the sessions cut short by their script are reported and the others are timed step by step
+    assert report['sessions'] == 20 and report['failed'] == 10
+    assert {failure['script'] for failure in report['errors']} == {1}
+    assert report['steps']['genre']['count'] == 20 and report['steps']['enjoyed?']['count'] == 10
+    assert report['sessions_per_second'] > 0
+
+    show_replay_report(report)
+    assert "20 sessions" in capsys.readouterr().out
+
+    # Assert that a script ending at the story length menu fails its session instead of retrying forever
+    results = []
+    worker = threading.Thread(target=lambda: results.append(replay_sessions(df, index, [['1']], sessions=1, workers=1)), daemon=True)
+    worker.start()
+    worker.join(timeout=10)
+    assert results and results[0]['errors'][0]['error'] == "the script ended before the episode range step"
+
+
+# ******************************************************************************************************************************************************
+#                                                       TEST CASE 22: episode counts
+# ******************************************************************************************************************************************************
+
+#Define a helper function that will create a sample DataFrame whose descriptions give episode counts
+def counted_df():
+    df = mock_df()
+    df['description'] = [
+        'Naruto has a total of 220 episodes.',
+        'Season 1: 25 episodes\nSeason 2: 12 episodes\nIn total, there are 37 episodes across both seasons.',
+        'Your Lie in April has 22 episodes. It also has an additional 2 OVA episodes.',
+        'A letter writer learns what love means.',
+    ]
+    df.loc[2, 'episode_range'] = 'Short'
+    return df
+
+# Test case for reading episode counts from descriptions and episode ranges typed by the user
+def test_extract_episode_count():
+    assert [extract_episode_count(description) for description in counted_df()['description']] == [220, 37, 22, -1]
+    assert extract_episode_count('Season 1: 26 episodes\nOVA: 2 episodes\nThe total number of episodes, including the OVA, is 28.') == 28
+    assert extract_episode_count('Part 1: 12 episodes. Part 2: 1,050 episodes.') == 1050
+    assert extract_episode_count(None) == -1
+
+    assert parse_episode_range('10-40') == parse_episode_range('10 – 40 episodes') == parse_episode_range('10 to 40') == (10, 40)
+    assert parse_episode_range('100+') == (100, None) and parse_episode_range('very long') == 'Very Long'
+    for text in ('', 'forty', '40-10'):
+        with pytest.raises(ValueError):
+            parse_episode_range(text)
+
+# Test case for range queries answered from the rows sorted by episode count
+def test_episode_count_index(tmp_path):
+    df = counted_df()
+    index = CatalogIndex(df)
+
+    # Assert that ranges are found by binary search and presets follow the counts, or the label when there is none
+    assert list(index.episode_rows(10, 40)) == [1, 2] and list(index.episode_rows(100)) == [0] and len(index.episode_rows(41, 99)) == 0
+    assert list(index.recommendation_rows('Drama', (20, 30))) == [2]
+    assert list(index.recommendation_rows('Drama', 'Medium')) == [2] and list(index.recommendation_rows('Drama', 'Short')) == [3]
+    assert list(index.availability('Drama')) == [1, 1, 0, 0]
+    with patch('builtins.input', side_effect=['30-35', '10-40']):
+        assert get_episode_range(df, 'Action', index) == (10, 40)
+
+    # Assert that numbers up to the length of the list pick a preset and larger ones are numbers of episodes
+    with patch('builtins.input', side_effect=['12', '37', '3']):
+        assert get_episode_range(df, 'Action', index) == (37, 37)
+        assert get_episode_range(df, 'Action', index) == 'Long'
+    assert list(get_anime_recommendations(df, 'Action', (10, 40), index)['title']) == ['Spy x Family']
+
+    # Assert that the compiled catalog stores the counts and its menu summary counts titles the same way
+    path = str(tmp_path / 'anime_data.csv')
+    df.to_csv(path, index=False, encoding='ISO-8859-1')
+    compiled, text = open_catalog(path)
+    assert list(compiled['episode_count']) == [220, 37, 22, -1]
+    assert [list(read_catalog_summary(path).availability(genre)) for genre in index.genres] == [list(CatalogIndex(compiled, text).availability(genre)) for genre in index.genres]
+
+    # Assert that a reload moves changed rows within the sorted rows like a full rebuild would
+    edited = counted_df()
+    edited.loc[0, 'description'] = 'Naruto has 12 episodes.'
+    reloaded = index.with_changes(edited, None, [0], [3])
+    assert list(reloaded.episode_rows(1, 15)) == [0] and list(reloaded.episode_rows(0)) == [0, 1, 2]
+    assert list(reloaded.availability('Action')) == [1, 0, 1, 0]